@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import numpy as np
+
+from simulation import Simulation, engines
+from scenes import scenes
+from render import TileCache
+
+# Runs the scripted scenes and compares them against stored baselines, so a
+# slower update shows up as a number instead of a feeling about the FPS counter
+
+default_baselines = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+
+# Ticks run before measuring, for scenes that should be measured once settled
+warmup_ticks = {
+    "settled": 10,
+}
+
+def build(scene:str, size:int, chunk_size:int, engine:str, seed:int, workers:int=None):
+    sim = Simulation((chunk_size, chunk_size), lazy=False, engine=engine, workers=workers, seed=seed)
+    scenes[scene](sim, size)
+    for _ in range(warmup_ticks.get(scene, 0)):
+        sim.update()
+    return sim
+
+def measure(scene:str, ticks:int, size:int, chunk_size:int, engine:str, seed:int, memory:bool=True, workers:int=None, render:bool=True):
+    sim = build(scene, size, chunk_size, engine, seed, workers)
+    view_size = (size * 3, size * 2)
+    camera_pos = (-size, 0)
+    tiles = TileCache()
+    tick_times = []
+    render_times = []
+    for frame in range(ticks):
+        start = time.perf_counter()
+        sim.update()
+        tick_times.append(time.perf_counter() - start)
+
+        if render:
+            start = time.perf_counter()
+            tiles.render(sim.sim, [chunk_pos for chunk_pos, _ in sim.get_chunks()], camera_pos, view_size, frame)
+            render_times.append(time.perf_counter() - start)
+    sim.close()
+
+    tick_times = np.array(tick_times) * 1000
+    result = {
+        "ticks_per_s": round(ticks / (tick_times.sum() / 1000), 2),
+        "p50_ms": round(float(np.percentile(tick_times, 50)), 3),
+        "p95_ms": round(float(np.percentile(tick_times, 95)), 3),
+        "p99_ms": round(float(np.percentile(tick_times, 99)), 3),
+        "max_ms": round(float(tick_times.max()), 3),
+    }
+    if render:
+        render_times = np.array(render_times) * 1000
+        result["render_p50_ms"] = round(float(np.percentile(render_times, 50)), 3)
+        result["render_p95_ms"] = round(float(np.percentile(render_times, 95)), 3)
+
+    # tracemalloc slows everything down, so memory gets its own run
+    if memory:
+        tracemalloc.start()
+        sim = build(scene, size, chunk_size, engine, seed, workers)
+        for _ in range(ticks):
+            sim.update()
+        sim.close()
+        result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 3)
+        tracemalloc.stop()
+
+    return result
+
+# Metrics where a higher number is better, everything else should stay low
+higher_is_better = {"ticks_per_s"}
+
+# Times also have to grow by more than floor_ms to count as a regression, a
+# 0.07 ms tick taking 0.1 ms is timer noise and not 40% slower. ticks_per_s is
+# checked as the mean tick time it stands for
+def compare(result:dict, baseline:dict, tolerance:float, floor_ms:float=0.0):
+    regressions = []
+    for metric, value in result.items():
+        if metric not in baseline or metric == "max_ms": # max_ms is too noisy to gate on
+            continue
+        old = baseline[metric]
+        if metric in higher_is_better:
+            regressed = value < old * (1 - tolerance)
+            if regressed and metric == "ticks_per_s":
+                regressed = 1000 / value - 1000 / old > floor_ms
+        else:
+            regressed = value > old * (1 + tolerance)
+            if regressed and metric.endswith("_ms"):
+                regressed = value - old > floor_ms
+        if regressed:
+            regressions.append(f"{metric} {old} -> {value}")
+    return regressions
+
+def load_baselines(path:str):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation on scripted scenes")
+    parser.add_argument("scenes", nargs="*", help=f"scenes to run (default: all of {', '.join(scenes)})")
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--engine", choices=engines, default="particle")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the parallel engine (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--no-render", action="store_true", help="skip timing a render after each tick")
+    parser.add_argument("--baselines", default=default_baselines)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before a metric counts as a regression")
+    parser.add_argument("--floor-ms", type=float, default=0.5, help="allowed absolute change of the times before they count as a regression")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    args = parser.parse_args(argv)
+
+    for scene in args.scenes:
+        if scene not in scenes:
+            parser.error(f"unknown scene {scene!r}")
+    selected = args.scenes or list(scenes)
+
+    engine = args.engine
+    if args.engine == "parallel":
+        engine += f"{args.workers or os.cpu_count()}"
+    config = f"{engine}/chunk{args.chunk_size}/size{args.size}/ticks{args.ticks}"
+    baselines = load_baselines(args.baselines)
+    config_baselines = baselines.get(config, {})
+
+    failed = False
+    results = {}
+    print(config)
+    for scene in selected:
+        result = measure(scene, args.ticks, args.size, args.chunk_size, args.engine, args.seed, not args.no_memory, args.workers, not args.no_render)
+        results[scene] = result
+
+        line = f"{scene:>12}: " + ", ".join(f"{metric} {value}" for metric, value in result.items())
+        if scene in config_baselines:
+            regressions = compare(result, config_baselines[scene], args.tolerance, args.floor_ms)
+            if regressions:
+                failed = True
+                line += "\n" + " " * 14 + "REGRESSED: " + ", ".join(regressions)
+        print(line)
+
+    if args.save:
+        config_baselines.update(results)
+        baselines[config] = config_baselines
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+        print(f"Saved baselines to {args.baselines}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,8 +6,28 @@ def quicksin(x:float):
     x = round(x) % 360
     return sin_lookup[x]
 
-def quickrand(x):
-    return np.random.randint(0,x)
+# Hands out random numbers from large pre-generated blocks, one list index per
+# draw instead of one NumPy call. Seeded pools give reproducible runs, and
+# generator can be used directly for vectorized draws
+class RandomPool:
+    def __init__(self, seed:int=None, block_size:int=4096):
+        self.block_size = block_size
+        self.seed(seed)
+
+    def seed(self, seed:int=None):
+        self.generator = np.random.default_rng(seed)
+        self.refill()
+
+    def refill(self):
+        self.block = self.generator.random(self.block_size).tolist()
+        self.index = 0
+
+    def randint(self, x:int):
+        if self.index >= self.block_size:
+            self.refill()
+        value = self.block[self.index]
+        self.index += 1
+        return int(value * x)
 
 neighbor_cords = [
     (0,1),
@@ -18,4 +38,20 @@ neighbor_cords = [
     (-1,-1),
     (-1,0),
     (-1,1)
-]
\ No newline at end of file
+]
+
+# Smallest inclusive (x0, y0, x1, y1) rect covering both rects
+def union_rect(a:tuple, b:tuple):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+# Bool masks of the cells within radius of the center cell, indexed [x, y] with
+# the center at [radius, radius]. Cached per radius, don't write to them
+disk_masks = {}
+def disk_mask(radius:int):
+    mask = disk_masks.get(radius)
+    if mask is None:
+        offsets = np.arange(-radius, radius + 1)
+        mask = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius ** 2
+        mask.flags.writeable = False
+        disk_masks[radius] = mask
+    return mask
@@ -0,0 +1,82 @@
+import argparse
+import time
+
+from simulation import Simulation, engines
+from scenes import scenes
+from snapshot import save_snapshot, load_snapshot
+from recording import Recording, Replay
+from profiling import Profiler
+from tracing import Tracer
+
+# Runs the simulation without pygame, as fast as it goes
+
+# before_tick, if given, is called with the simulation before every update
+def run(sim:Simulation, ticks:int, before_tick=None):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if before_tick:
+            before_tick(sim)
+        sim.update()
+    return time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the particle simulation without a window and report ticks/s")
+    parser.add_argument("--scene", choices=sorted(scenes), default="sand")
+    parser.add_argument("--size", type=int, default=64, help="scene size in cells")
+    parser.add_argument("--ticks", type=int, default=None, help="ticks to run (default: 200, or the length of a replayed session)")
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--engine", choices=engines, default=None, help="default: particle, or the recorded engine for a replay")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the parallel engine (default: all cores)")
+    grid = parser.add_mutually_exclusive_group()
+    grid.add_argument("--sparse", action="store_true", help="use the dict based grid instead of NumPy chunks")
+    grid.add_argument("--dense", action="store_true", help="use NumPy chunks with the particle engine too (default: only for the other engines and --heat)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--heat", action="store_true", help="let particles react to a spreading temperature field instead of hot neighbours")
+    parser.add_argument("--scan-triggers", action="store_true", help="update trigger particles every tick instead of when a neighbour sets them off")
+    parser.add_argument("--load", metavar="PATH", help="start from a snapshot instead of a scene, the grid settings come from the snapshot")
+    parser.add_argument("--save", metavar="PATH", help="write a snapshot of the world after the run")
+    parser.add_argument("--profile", metavar="PATH", help="collect per stage and per type counters and write them to PATH (.csv or .json)")
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace of the run to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="replay a session recorded with main.py --record instead of running a scene")
+    args = parser.parse_args(argv)
+    if args.sparse and args.engine not in (None, "particle"):
+        parser.error(f"--engine {args.engine} needs the dense grid, it can't be used with --sparse")
+    if args.sparse and args.heat:
+        parser.error("--heat needs the dense grid, it can't be used with --sparse")
+
+    ticks = args.ticks if args.ticks is not None else 200
+    before_tick = None
+    if args.replay:
+        recording = Recording.load(args.replay)
+        overrides = {"engine": args.engine, "workers": args.workers}
+        sim = recording.build(**{key: value for key, value in overrides.items() if value != None})
+        before_tick = Replay(recording).apply
+        ticks = args.ticks if args.ticks is not None else recording.ticks
+        name = args.replay
+    elif args.load:
+        sim = load_snapshot(args.load, args.engine or "particle", args.workers)
+        name = args.load
+    else:
+        sim = Simulation((args.chunk_size, args.chunk_size), lazy=False, dense=True if args.dense else False if args.sparse else None, engine=args.engine or "particle", workers=args.workers, seed=args.seed, event_triggers=not args.scan_triggers, heat=args.heat)
+        scenes[args.scene](sim, args.size)
+        name = args.scene
+
+    if args.profile:
+        sim.profiler = Profiler(history=ticks)
+    if args.trace:
+        sim.tracer = Tracer()
+    elapsed = run(sim, ticks, before_tick)
+    if args.save:
+        save_snapshot(sim, args.save)
+    particles = sum(sim.sim.counts)
+    print(f"{name}: {ticks} ticks in {elapsed:.3f}s, {ticks / elapsed if elapsed else 0:.1f} ticks/s ({particles} particles, {len(sim.active)} active chunks)")
+    if args.trace:
+        sim.tracer.save(args.trace)
+    if args.profile:
+        sim.profiler.dump(args.profile)
+        for line in sim.profiler.summary():
+            print("  " + line)
+    sim.close()
+
+if __name__ == "__main__":
+    main()
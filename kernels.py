@@ -0,0 +1,101 @@
+import numpy as np
+
+from particle_tables import tables
+from boilerplate import neighbor_cords, union_rect
+
+VOID = 4
+
+# Moves every powder and liquid particle inside the border of a window in place.
+# The window is indexed [x, y] with y pointing up, and has a 1 cell border that
+# particles can move into but that is not updated itself. y_offset is the world y
+# of row 0. Cells are updated in 6 phases (x % 3, y % 2) so that no two particles
+# in the same phase can target the same cell. rng is a numpy.random.Generator.
+# region limits the update to an inclusive (x0, y0, x1, y1) rect of the chunk.
+# Returns whether anything moved, and the chunk-local rect of particles that could
+# have moved but lost their roll (None if there were none)
+def move_window(ids:np.ndarray, life:np.ndarray, y_offset:int, rng:np.random.Generator, region:tuple=None):
+    movers = np.zeros(ids.shape, dtype=bool)
+    if region == None:
+        movers[1:-1, 1:-1] = tables.vector_moved[ids[1:-1, 1:-1]]
+    else:
+        area = (slice(region[0] + 1, region[2] + 2), slice(region[1] + 1, region[3] + 2))
+        movers[area] = tables.vector_moved[ids[area]]
+    if not movers.any():
+        return False, None
+
+    any_moved = False
+    waiting = None
+    for phase_x in range(3):
+        for phase_y in range(2):
+            phase = movers[phase_x::3, phase_y::2]
+            xs, ys = np.nonzero(phase)
+            if not len(xs):
+                continue
+            xs = xs * 3 + phase_x
+            ys = ys * 2 + phase_y
+            types = ids[xs, ys]
+
+            possible = np.zeros((len(xs), len(tables.directions)), dtype=bool)
+            for i, (dx, dy) in enumerate(tables.directions):
+                target = ids[xs + dx, ys + dy]
+                possible[:, i] = ((target < 0) | (target == VOID)) & (ys + dy + y_offset >= 1)
+            possible &= tables.allowed_moves[types]
+
+            count = possible.sum(axis=1)
+            can_move_down = possible[:, tables.down_index]
+            rolls = rng.integers(0, 100, (len(xs), 2))
+
+            take_down = can_move_down & (rolls[:, 0] < tables.move_down_chance[types])
+            moving = (count > 0) & (can_move_down | (rolls[:, 1] < tables.movement_chance[types] - 1))
+            # Lost the roll, but could win it next time (rock never does)
+            stuck = (count > 0) & ~moving & (tables.movement_chance[types] > 1)
+            if stuck.any():
+                rect = (int(xs[stuck].min()) - 1, int(ys[stuck].min()) - 1, int(xs[stuck].max()) - 1, int(ys[stuck].max()) - 1)
+                waiting = union_rect(waiting, rect) if waiting else rect
+            if not moving.any():
+                continue
+
+            # Pick one of the possible movements at random, down included
+            pick = rng.integers(0, np.maximum(count, 1))
+            picked = (np.cumsum(possible, axis=1) == (pick + 1)[:, None]) & possible
+            choice = np.where(take_down, tables.down_index, picked.argmax(axis=1))
+
+            xs, ys, types, choice = xs[moving], ys[moving], types[moving], choice[moving]
+            moves = tables.direction_array[choice]
+            new_xs = xs + moves[:, 0]
+            new_ys = ys + moves[:, 1]
+            kept = ids[new_xs, new_ys] != VOID
+
+            ids[new_xs[kept], new_ys[kept]] = types[kept]
+            life[new_xs[kept], new_ys[kept]] = life[xs[kept], ys[kept]]
+            movers[xs, ys] = False
+            ids[xs, ys] = -1
+            life[xs, ys] = 0
+            any_moved = True
+
+    return any_moved, waiting
+
+# Finds the reactions between the particles inside the border of a window and
+# their neighbours. reaction is a particle_tables.Reactions matrix, and only the
+# types set in the bool array types react. region is an inclusive chunk-local
+# rect like in move_window.
+# Returns (x, y, neighbour index, reaction) tuples with chunk-local positions and
+# the neighbour as an index into boilerplate.neighbor_cords, sorted in the order
+# they should be applied
+def find_reactions(ids:np.ndarray, reaction:np.ndarray, types:np.ndarray, region:tuple=None):
+    if region == None:
+        region = (0, 0, ids.shape[0] - 3, ids.shape[1] - 3)
+    x0, y0, x1, y1 = region
+    center = ids[x0 + 1:x1 + 2, y0 + 1:y1 + 2]
+    reacting = types[center]
+    if not reacting.any():
+        return []
+
+    found = []
+    for index, (dx, dy) in enumerate(neighbor_cords):
+        neighbor = ids[x0 + 1 + dx:x1 + 2 + dx, y0 + 1 + dy:y1 + 2 + dy]
+        hits = reaction[center, neighbor]
+        xs, ys = np.nonzero(reacting & (hits >= 0))
+        found.extend(zip((xs + x0).tolist(), (ys + y0).tolist(), [index] * len(xs), hits[xs, ys].tolist()))
+    found.sort()
+    return found
@@ -1,229 +1,41 @@
-import math
 import pygame
+import argparse
+import os
 import time
 import random
 
-from particle_data import particle_data, type_behaviours
-from boilerplate import quicksin, quickrand, neighbor_cords
-
-class SparseGrid:
-    def __init__(self, data:dict={}):
-        self.data = data.copy()
-
-    def get(self, pos:tuple[int,int]):
-        return self.data.get(pos, None)
-    
-    def set(self, pos:tuple[int,int], data):
-        if data == None:
-            if pos in self.data:
-                self.data.pop(pos)
-            return
-        self.data[pos] = data
-
-    def get_all(self):
-        return self.data.items()
-
-    def copy(self):
-        return SparseGrid(self.data)
-
-class ChunkedGrid:
-    def __init__(self, chunk_size:tuple[int,int]=(16,16), data:dict={}):
-        self.data = SparseGrid(data)
-        self.chunk_size = chunk_size
-
-    def _get_chunk_cords(self,pos:tuple[int,int]):
-        x, y = pos
-        chunk_cords = math.floor(x / self.chunk_size[0]), math.floor(y / self.chunk_size[1])
-        subchunk_cords = (x % self.chunk_size[0]), (y % self.chunk_size[1])
-        return chunk_cords, subchunk_cords
-
-    def get(self,pos:tuple[int,int]):
-        chunk_cords, subchunk_cords = self._get_chunk_cords(pos)
-        chunk = self.data.get(chunk_cords)
-        if chunk:
-            return chunk.get(subchunk_cords)
-        return None
-
-    def get_chunk(self, pos:tuple[int,int]):
-        return self.data.get(pos)
-
-    def set(self,pos:tuple[int,int], data):
-        chunk_cords, subchunk_cords = self._get_chunk_cords(pos)
-        chunk = self.data.get(chunk_cords)
-        if not chunk:
-            chunk = SparseGrid()
-            chunk.set(subchunk_cords, data)
-            self.data.set(chunk_cords,chunk)
-        else:
-            chunk.set(subchunk_cords, data)
-
-        if not chunk.data:
-            self.data.set(chunk_cords, None)
-    
-    def copy(self):
-        chunks_copy_data = {}
-        for pos, chunk in self.data.get_all():
-            chunks_copy_data[pos] = chunk.copy()
-
-        return ChunkedGrid(self.chunk_size, chunks_copy_data)
-
-class Simulation:
-    def __init__(self, chunk_size:tuple[int,int], lazy:bool=True, lazy_range:int=2) -> None:
-        self.lazy = lazy
-        self.lazy_range = lazy_range
-
-        self.chunk_size = chunk_size
-        self.sim = ChunkedGrid(self.chunk_size)
-        
-        self.active = {}
-        self.default_life = 6
-    
-    def set_pos(self, pos:tuple[int,int], part_id:int):
-        chunk_cords, subchunk_cords = self.sim._get_chunk_cords(pos)
-
-        self.activate_around(chunk_cords)
-
-        if part_id == None:
-            part_dat = None
-        else:
-            part_dat:list = particle_data[part_id]["created"].copy()
-            part_dat[0] = part_id
-        self.sim.set(pos, part_dat)
-
-    def get_chunks(self):
-        return self.sim.data.get_all()
-
-    def update(self):
-        new_state = self.sim.copy()
-
-        old_active = self.active.copy()
-        for chunk_pos in old_active.keys():
-            self.update_chunk(chunk_pos, new_state)
-
-        self.sim = new_state
-
-    def get_real(self, pos:tuple, chunk_cords:tuple):
-        return (
-            pos[0] + chunk_cords[0] * self.chunk_size[0],
-            pos[1] + chunk_cords[1] * self.chunk_size[1]
-        )
-    
-    def activate_around(self, pos:tuple):
-        x, y = pos
-        neighbors = [
-            (x,y),
-            (x - 1, y),  # West
-            (x + 1, y),  # East
-            (x, y - 1),  # North
-            (x, y + 1),  # South
-            (x - 1, y - 1),  # Northwest
-            (x + 1, y - 1),  # Northeast
-            (x - 1, y + 1),  # Southwest
-            (x + 1, y + 1),  # Southeast
-        ]
-
-        for neighbor in neighbors:
-            self.active[neighbor] = self.default_life
-
-    def update_chunk(self, chunk_cords:tuple[int,int], simstate:ChunkedGrid):
-        chunk:SparseGrid = simstate.get_chunk(chunk_cords)
-        if not chunk:
-            self.active.pop(chunk_cords)
-            return
-
-        moved = False
-
-        old = chunk.copy()
-        for pos, part_data in old.get_all():
-            part_type = part_data[0]
-            particle_type_data:dict = particle_data[part_type]
-
-            movements = type_behaviours[particle_type_data["type"]]
-            move_down_chance = particle_type_data.get("move_down_chance",100)
-            movement_chance = particle_type_data.get("movement_chance",100)
-            
-            old_pos = self.get_real(pos, chunk_cords)
-            new_pos = old_pos
-
-            neighbors = {}
-            for relpos in neighbor_cords:
-                real_pos = (new_pos[0] + relpos[0], new_pos[1] + relpos[1])
-                part_at_pos = simstate.get(real_pos)
-                if part_at_pos:
-                    neighbors[real_pos] = part_at_pos
-
-            possible_movements = []
-            move_down = None
-            for movement in movements:
-                movement_pos = (new_pos[0] + movement[0], new_pos[1] + movement[1])
-                if movement_pos[1] < 1:
-                    continue
-                part_at_pos = neighbors.get(movement_pos, None)
-                if (not part_at_pos) or (part_at_pos[0] == 4):
-                    deleted = False
-                    if part_at_pos and part_at_pos[0] == 4:
-                        deleted = True
-
-                    movement_data = (movement_pos, deleted)
-                    possible_movements.append(movement_data)
-                    if movement == (0, -1):
-                        move_down = movement_data
-
-            deleted_self = False
-            if "update_func" in particle_type_data:
-                update_func = particle_type_data["update_func"]
-                part_data, exists, active = update_func(old_pos, part_data, list(neighbors.items()), simstate)
-                deleted_self = not exists
-
-                if active:
-                    moved = True
-            
-            # set new_pos to one of the possible movements
-            # set deleted
-            
-            deleted = False
-            if possible_movements:
-                p_m_count = len(possible_movements)
-                if move_down and (quickrand(100) <= move_down_chance - 1):
-                    new_pos, deleted = move_down
-                    moved = True
-                else:
-                    if not move_down:
-                        if (quickrand(100) >= movement_chance - 1):
-                            continue
-                    moved = True
-                    if p_m_count == 1:
-                        new_pos, deleted = possible_movements[0]
-                    else:
-                        new_pos, deleted = possible_movements[quickrand(len(possible_movements))]
-            
-            if deleted_self:
-                deleted = True
+from particle_data import particle_data
+from boilerplate import quicksin
+from simulation import Simulation
+from snapshot import save_snapshot, load_snapshot
+from render import TileCache
+from recording import Recording, Replay
+from profiling import Profiler
+from tracing import Tracer, no_span
 
-            # Movement logic
-            if possible_movements or deleted:
-                simstate.set(old_pos, None)
-
-            if not deleted:
-                simstate.set(new_pos, part_data)
-        
-        if not simstate.get_chunk(chunk_cords):
-            self.active.pop(chunk_cords)
-        elif not moved:
-            self.active[chunk_cords] -= 1
-            if self.active[chunk_cords] <= 0:
-                self.active.pop(chunk_cords)
-        elif moved:
-            self.active[chunk_cords] = self.default_life
-            self.activate_around(chunk_cords)
-        
 class Interface:
     def get_relative(self,pos:tuple[int,int]):
         return (pos[0] - self.camera_pos[0]), ((self.ZOOM_HEIGHT - pos[1]) - self.camera_pos[1])
 
+    # Chunk coordinates the lazy loading keeps awake, a bit more than the screen
+    def chunks_in_view(self):
+        width, height = self.sim.chunk_size
+        margin_x, margin_y = width * (self.sim.lazy_range + 1), height * (self.sim.lazy_range + 1)
+        for chunk_x in range((self.camera_pos[0] - margin_x) // width, (self.camera_pos[0] + self.ZOOM_WIDTH + margin_x) // width + 1):
+            for chunk_y in range((-self.camera_pos[1] - margin_y) // height, (self.ZOOM_HEIGHT - self.camera_pos[1] + margin_y) // height + 1):
+                yield chunk_x, chunk_y
+
     def render_parts(self):
-        positions = []
-        for chunk_pos, chunk in self.sim.get_chunks():
+        visible = []
+        debug_rects = []
+        # Paged out chunks aren't in get_chunks, the ones coming into view are paged
+        # back in here and sorted out by the loop below
+        if self.sim.sim.paged:
+            for chunk_pos in self.chunks_in_view():
+                if chunk_pos in self.sim.sim.paged:
+                    self.sim.sim.get_chunk(chunk_pos)
+
+        for chunk_pos, chunk in list(self.sim.get_chunks()):
             ajust = (
                 chunk_pos[0] * self.sim.chunk_size[0],
                 chunk_pos[1] * self.sim.chunk_size[1]
@@ -231,21 +43,19 @@ class Interface:
             relpos = self.get_relative((ajust[0], ajust[1] + self.sim.chunk_size[1]))
             in_screen_dim = lambda i: (-(self.sim.chunk_size[i] * self.sim.lazy_range) < (relpos[i]) < ((self.ZOOM_WIDTH, self.ZOOM_HEIGHT)[i] + (self.sim.chunk_size[i] * self.sim.lazy_range)))
             if not (in_screen_dim(0) and in_screen_dim(1)): # Skip invisible chunks
-                if self.sim.lazy:
-                    if chunk_pos in self.sim.active:
-                        self.sim.active.pop(chunk_pos)
-                        self.lazy_unloaded.add(chunk_pos)
+                if self.sim.lazy and not self.replay:
+                    if chunk_pos not in self.sim.unloaded:
+                        if self.recording:
+                            self.recording.sleep(self.sim.ticks, chunk_pos)
+                        self.sim.sleep_chunk(chunk_pos)
                 continue
             else:
-                if chunk_pos in self.lazy_unloaded:
-                    self.sim.active[chunk_pos] = self.sim.default_life
-                    self.lazy_unloaded.remove(chunk_pos)
+                if chunk_pos in self.sim.unloaded and not self.replay:
+                    if self.recording:
+                        self.recording.wake(self.sim.ticks, chunk_pos)
+                    self.sim.wake_chunk(chunk_pos)
 
-            for part_pos, part in chunk.get_all():
-                x = part_pos[0] + ajust[0]
-                y = part_pos[1] + ajust[1]
-
-                positions.append(((x,y),part))
+            visible.append(chunk_pos)
 
             if DEBUG:
                 if chunk_pos in self.sim.active:
@@ -253,25 +63,21 @@ class Interface:
                 else:
                     chunk_color = (50, 50, 50)
 
-                pygame.draw.rect(self.surf, chunk_color, (*relpos, *self.sim.chunk_size), 1)
-
-        for pos, part in positions:
-            particle_type = particle_data[part[0]]["type"]
-            if "render" in particle_data[part[0]]:
-                particle_type = particle_data[part[0]]["render"]
-            relative_pos = self.get_relative(pos)
+                debug_rects.append((chunk_color, (*relpos, *self.sim.chunk_size)))
 
-            part_color = particle_data[part[0]]["color"]
+                rect = self.sim.active.get(chunk_pos)
+                if rect: # Cells the chunk updated this tick
+                    corner = self.get_relative((ajust[0] + rect[0], ajust[1] + rect[3] + 1))
+                    debug_rects.append(((200, 120, 50), (*corner, rect[2] - rect[0] + 1, rect[3] - rect[1] + 1)))
 
-            brightness = 1
-            if particle_type == "liquid":
-                brightness = ((quicksin((self.frame_counter * 5) + (pos[0] + pos[1]) * 30) + 1) / 8) + 0.75
-            elif particle_type == "powder":
-                brightness = (((pos[0] + pos[1]) % 3) / 8) + 0.75
-            
-            part_color = (min(part_color[0] * brightness, 255),min(part_color[1] * brightness, 255),min(part_color[2] * brightness, 255))
+        # The whole frame is composed from cached chunk tiles and blitted at once
+        span = self.tracer.span if self.tracer else no_span
+        with span("compose", "render", chunks=len(visible)):
+            frame = self.tiles.render(self.sim.sim, visible, self.camera_pos, (self.ZOOM_WIDTH, self.ZOOM_HEIGHT), self.frame_counter)
+            pygame.surfarray.blit_array(self.surf, frame)
 
-            pygame.draw.line(self.surf, part_color, relative_pos, relative_pos)
+        for chunk_color, rect in debug_rects:
+            pygame.draw.rect(self.surf, chunk_color, rect, 1)
 
     def render_debug_text(self, lines:list):
         for i, line in enumerate(lines):
@@ -301,8 +107,13 @@ class Interface:
                 f"Times:",
                 f"Update: {self.times.get("update",None)}",
                 f"Render: {self.times.get("render",None)}",
-                f"Total: {self.times.get("total",None)}"
+                f"Total: {self.times.get("total",None)}",
+                f"",
+                f"Particles: {sum(self.sim.sim.counts)}"
             ]
+            if self.profiler: # Averages over the last second
+                debug_lines.append(f"")
+                debug_lines += self.profiler.summary(60)
 
             for line in debug_lines:
                 texts.append(line)
@@ -361,26 +172,33 @@ class Interface:
         self.screen.blit(surf, pos)
 
     def render(self):
+        span = self.tracer.span if self.tracer else no_span
         self.surf = pygame.Surface((self.WIDTH // self.zoom, self.HEIGHT // self.zoom))
 
-        self.render_parts()
+        with span("render_parts", "render"):
+            self.render_parts()
         pygame.draw.rect(self.surf, (100,100,100), ((0,self.get_relative((0,0))[1]), (self.ZOOM_WIDTH, 1)))
 
-        self.render_debug()
-        self.render_part_select(10, 50)
+        with span("render_debug", "render"):
+            self.render_debug()
+            self.render_part_select(10, 50)
 
-        pygame.display.flip()  # Update the display
+        with span("flip", "render"):
+            pygame.display.flip()  # Update the display
 
     def mainloop(self):
+        span = self.tracer.span if self.tracer else no_span
+
         def add_with_brush(pos:tuple, part_id:int, brush_size:int):
-            for x in range(pos[0] - brush_size, pos[0] + brush_size + 1):
-                for y in range(pos[1] - brush_size, pos[1] + brush_size + 1):
-                    if y < 1:
-                        continue
-                    if (part_id == None) or (not self.sim.sim.get((x, y))):
-                        self.sim.set_pos((x, y), part_id)
-
-        if self.mouse[1]:
+            if self.recording:
+                self.recording.brush(self.sim.ticks, pos, part_id, brush_size)
+            self.sim.paint_brush(pos, part_id, brush_size)
+
+        if self.replay:
+            self.replay.apply(self.sim)
+            if self.replay.done(self.sim):
+                self.replay = None # Back to the mouse and the lazy loading
+        elif self.mouse[1]:
             add_with_brush(self.rel_mouse_pos, self.brush, self.brush_size)
         elif self.mouse[3]:
             add_with_brush(self.rel_mouse_pos, None, self.brush_size)
@@ -389,7 +207,8 @@ class Interface:
         self.sim.update()
 
         t_update = time.perf_counter()
-        self.render()
+        with span("render", "render", frame=self.frame_counter):
+            self.render()
 
         t_render = time.perf_counter()
 
@@ -398,7 +217,8 @@ class Interface:
         self.times["render"] = round(t_render - t_update, digits)
         self.times["total"] = round(t_render - t_prev, digits)
 
-        self.clock.tick(60)  # Limit the framerate to 60 FPS
+        with span("wait", "render"):
+            self.clock.tick(60)  # Limit the framerate to 60 FPS
 
     def set_zoom(self, zoom:float):
         self.true_zoom = zoom
@@ -406,7 +226,16 @@ class Interface:
         self.ZOOM_WIDTH = self.WIDTH // self.zoom
         self.ZOOM_HEIGHT = self.HEIGHT // self.zoom
 
-    def __init__(self) -> None:
+    def save_recording(self):
+        if self.recording:
+            self.recording.ticks = self.sim.ticks
+            self.recording.save(self.record_path)
+            self.recording = None
+
+    # With record_path, the session's input is recorded there when the window is
+    # closed. With replay_path, a recorded session is played back before the
+    # mouse takes over. With trace_path, a timeline of the session is written there
+    def __init__(self, record_path:str=None, replay_path:str=None, seed:int=None, trace_path:str=None) -> None:
         self.WIDTH, self.HEIGHT = 1200, 800
 
         pygame.init()
@@ -437,9 +266,28 @@ class Interface:
         self.scroll_sensitivity = 3
         self.brush_size_scroll = self.brush_size * self.scroll_sensitivity
 
-        size = 4
-        self.sim = Simulation(chunk_size=(size, size))
-        self.lazy_unloaded = set()
+        size = 16
+        self.max_cold_chunks = 256 # Off-screen chunks kept in memory before they are paged to disk
+        self.profiler = Profiler() if DEBUG else None # F6 dumps it to profile.csv and profile.json
+        self.tracer = Tracer() if trace_path else None
+        self.record_path = record_path
+        self.recording = None
+        self.replay = None
+        if replay_path:
+            recording = Recording.load(replay_path)
+            self.sim = recording.build()
+            self.replay = Replay(recording)
+        else:
+            if record_path and seed == None:
+                seed = random.randrange(2**32) # Replays need a known seed
+            settings = {"chunk_size": (size, size), "engine": "vector", "max_cold_chunks": self.max_cold_chunks, "seed": seed}
+            self.sim = Simulation(**settings)
+            if record_path:
+                self.recording = Recording(settings)
+        self.sim.profiler = self.profiler
+        self.sim.tracer = self.tracer
+        self.tiles = TileCache()
+        self.snapshot_path = "world.npz" # F5 saves the world here, F9 loads it
 
         running = True
         self.mouse = {
@@ -454,68 +302,96 @@ class Interface:
 
         self.frame_counter = 0
 
-        while running:
-            self.mouse_pos = pygame.mouse.get_pos()
-            self.resized_mouse_pos = (self.mouse_pos[0] // self.zoom), (self.mouse_pos[1] // self.zoom)
-            self.rel_mouse_pos = (self.resized_mouse_pos[0] + self.camera_pos[0], self.ZOOM_HEIGHT - (self.resized_mouse_pos[1] + self.camera_pos[1]))
+        # Closing the simulation removes its page file, also if the game crashes
+        try:
+            while running:
+                self.mouse_pos = pygame.mouse.get_pos()
+                self.resized_mouse_pos = (self.mouse_pos[0] // self.zoom), (self.mouse_pos[1] // self.zoom)
+                self.rel_mouse_pos = (self.resized_mouse_pos[0] + self.camera_pos[0], self.ZOOM_HEIGHT - (self.resized_mouse_pos[1] + self.camera_pos[1]))
             
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    for i in range(5):
-                        i += 1
-                        if event.button == i:
-                            self.mouse[i] = True
-
-                            if i == 4:
-                                self.brush_size_scroll += 1
-                            elif i == 5:
-                                self.brush_size_scroll -= 1
-                                if self.brush_size_scroll < 0:
-                                    self.brush_size_scroll = 0
-
-                    self.brush_size = self.brush_size_scroll // self.scroll_sensitivity
-
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    for i in range(5):
-                        if event.button == i + 1:
-                            self.mouse[i + 1] = False
-
-            pressed = pygame.key.get_pressed()      
-            if pressed[pygame.K_w]:
-                self.camera_pos[1] -= self.camera_speed
-            if pressed[pygame.K_s]:
-                self.camera_pos[1] += self.camera_speed
-            if pressed[pygame.K_a]:
-                self.camera_pos[0] -= self.camera_speed
-            if pressed[pygame.K_d]:
-                self.camera_pos[0] += self.camera_speed
-
-            if pressed[pygame.K_LEFT]:
-                self.brush_true -= 0.15
-                if self.brush_true < 0:
-                    self.brush_true = len(particle_data) - 1
-            if pressed[pygame.K_RIGHT]:
-                self.brush_true += 0.15
-                if self.brush_true > len(particle_data) - 1:
-                    self.brush_true = 0
-            self.brush = round(self.brush_true)
-
-            if pressed[pygame.K_MINUS]:
-                if not self.zoom == 1:
-                    self.set_zoom(self.true_zoom / self.zoom_speed)
-            if pressed[pygame.K_EQUALS]:
-                self.set_zoom(self.true_zoom * self.zoom_speed)
-
-            self.frame_counter += 1
-            if self.frame_counter >= 3600:
-                self.frame_counter = 0
-
-            self.mainloop()
-
-        pygame.quit()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.MOUSEBUTTONDOWN:
+                        for i in range(5):
+                            i += 1
+                            if event.button == i:
+                                self.mouse[i] = True
+
+                                if i == 4:
+                                    self.brush_size_scroll += 1
+                                elif i == 5:
+                                    self.brush_size_scroll -= 1
+                                    if self.brush_size_scroll < 0:
+                                        self.brush_size_scroll = 0
+
+                        self.brush_size = self.brush_size_scroll // self.scroll_sensitivity
+
+                    elif event.type == pygame.MOUSEBUTTONUP:
+                        for i in range(5):
+                            if event.button == i + 1:
+                                self.mouse[i + 1] = False
+
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_F5:
+                            save_snapshot(self.sim, self.snapshot_path)
+                        elif event.key == pygame.K_F9 and os.path.exists(self.snapshot_path):
+                            self.save_recording() # Replays start from an empty world, so recording stops here
+                            self.replay = None
+                            self.sim.close()
+                            self.sim = load_snapshot(self.snapshot_path, max_cold_chunks=self.max_cold_chunks)
+                            self.sim.profiler = self.profiler
+                            self.sim.tracer = self.tracer
+                        elif event.key == pygame.K_F6 and self.profiler:
+                            self.profiler.dump_csv("profile.csv")
+                            self.profiler.dump_json("profile.json")
+
+                pressed = pygame.key.get_pressed()      
+                if pressed[pygame.K_w]:
+                    self.camera_pos[1] -= self.camera_speed
+                if pressed[pygame.K_s]:
+                    self.camera_pos[1] += self.camera_speed
+                if pressed[pygame.K_a]:
+                    self.camera_pos[0] -= self.camera_speed
+                if pressed[pygame.K_d]:
+                    self.camera_pos[0] += self.camera_speed
+
+                if pressed[pygame.K_LEFT]:
+                    self.brush_true -= 0.15
+                    if self.brush_true < 0:
+                        self.brush_true = len(particle_data) - 1
+                if pressed[pygame.K_RIGHT]:
+                    self.brush_true += 0.15
+                    if self.brush_true > len(particle_data) - 1:
+                        self.brush_true = 0
+                self.brush = round(self.brush_true)
+
+                if pressed[pygame.K_MINUS]:
+                    if not self.zoom == 1:
+                        self.set_zoom(self.true_zoom / self.zoom_speed)
+                if pressed[pygame.K_EQUALS]:
+                    self.set_zoom(self.true_zoom * self.zoom_speed)
+
+                self.frame_counter += 1
+                if self.frame_counter >= 3600:
+                    self.frame_counter = 0
+
+                self.mainloop()
+
+            self.save_recording()
+            if self.tracer:
+                self.tracer.save(trace_path)
+        finally:
+            self.sim.close()
+            pygame.quit()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Falling sand simulation")
+    parser.add_argument("--record", metavar="PATH", help="record the session's input to PATH, for replays")
+    parser.add_argument("--replay", metavar="PATH", help="play back a recorded session")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace", metavar="PATH", help="write a Chrome trace of the session to PATH")
+    args = parser.parse_args()
+
     DEBUG = False
-    interface = Interface()
+    interface = Interface(args.record, args.replay, args.seed, args.trace)
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import numpy as np
+
+# Keeps chunks that were paged out of a DenseChunkedGrid in a memory-mapped
+# region file. The file is split into fixed-size slots, each holding the type id
+# and life planes of one chunk. Freed slots are reused, and the file doubles in
+# size when it runs out of them. Only pages the OS chose to keep are in memory.
+
+class ChunkStore:
+    # Without a path the store uses a temporary file that is removed on close.
+    # A given path is overwritten, the file is scratch space and not a save
+    def __init__(self, chunk_size:tuple[int,int], path:str=None, capacity:int=256):
+        self.chunk_size = chunk_size
+        self.temporary = path == None
+        if path == None:
+            handle, path = tempfile.mkstemp(suffix=".chunks")
+            os.close(handle)
+        self.path = path
+        self.capacity = 0
+        self.free = [] # Unused slots, lowest last
+        self.map = None
+        self._grow(capacity)
+
+    def _grow(self, capacity:int):
+        shape = (capacity, 2) + tuple(self.chunk_size)
+        if self.map is None:
+            self.map = np.memmap(self.path, dtype=np.int16, mode="w+", shape=shape)
+        else:
+            self.map.flush()
+            self.map = None
+            with open(self.path, "r+b") as f:
+                f.truncate(int(np.prod(shape)) * 2)
+            self.map = np.memmap(self.path, dtype=np.int16, mode="r+", shape=shape)
+        self.free = list(range(capacity - 1, self.capacity - 1, -1)) + self.free
+        self.capacity = capacity
+
+    # Copies a chunk's planes into a free slot and returns the slot
+    def write(self, ids:np.ndarray, life:np.ndarray):
+        if not self.free:
+            self._grow(self.capacity * 2)
+        slot = self.free.pop()
+        self.map[slot, 0] = ids
+        self.map[slot, 1] = life
+        return slot
+
+    # Copies of the planes in a slot, the slot stays taken
+    def read(self, slot:int):
+        return np.array(self.map[slot, 0]), np.array(self.map[slot, 1])
+
+    def release(self, slot:int):
+        self.free.append(slot)
+
+    def close(self):
+        if self.map is None:
+            return
+        self.map = None
+        if self.temporary:
+            os.remove(self.path)
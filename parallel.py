@@ -0,0 +1,121 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from kernels import move_window
+from particle_tables import tables
+
+# Runs kernels.move_window for many chunks at once on a process pool.
+# Active chunks are split into a 2x2 checkerboard of phases. Chunks in the same
+# phase are at least one chunk apart, so their windows (chunk plus a 1 cell
+# border) never overlap and can be moved in any order. Each phase's windows are
+# copied into one shared memory block that the workers update in place.
+
+_attached = {} # Shared memory blocks a worker has already opened, by name
+
+def _attach(name:str):
+    shm = _attached.get(name)
+    if shm == None:
+        for old in _attached.values():
+            old.close()
+        _attached.clear()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+    return shm
+
+def _move_batch(name:str, shape:tuple, start:int, stop:int, y_offsets:list, regions:list, seed:int):
+    shm = _attach(name)
+    windows = np.ndarray(shape, dtype=np.int16, buffer=shm.buf)
+    rng = np.random.default_rng(seed)
+    results = []
+    for i, y_offset, region in zip(range(start, stop), y_offsets, regions):
+        results.append(move_window(windows[0, i], windows[1, i], y_offset, rng, region))
+    return results
+
+class ParallelMover:
+    def __init__(self, chunk_size:tuple[int,int], workers:int=None, inline_below:int=4):
+        if chunk_size[0] < 2 or chunk_size[1] < 2:
+            raise ValueError("Parallel updates need chunks of at least 2x2 cells")
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.inline_below = inline_below # Phases with fewer chunks skip the pool
+
+        self.pool = None
+        self.shm = None
+
+    def _buffer(self, count:int):
+        window_shape = (self.chunk_size[0] + 2, self.chunk_size[1] + 2)
+        shape = (2, count) + window_shape
+        size = int(np.prod(shape)) * 2
+        if self.shm == None or self.shm.size < size:
+            self._free_buffer()
+            self.shm = shared_memory.SharedMemory(create=True, size=size * 2) # Leave room to grow
+        return np.ndarray(shape, dtype=np.int16, buffer=self.shm.buf)
+
+    def _free_buffer(self):
+        if self.shm != None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    # Moves all powders and liquids inside each chunk's rect in rects. rng is the
+    # simulation's numpy.random.Generator, workers get seeds drawn from it.
+    # Returns (chunk_pos, rect) pairs of particles that could have moved but didn't
+    def move_chunks(self, grid, chunks:list, rng:np.random.Generator, rects:dict):
+        phases = {}
+        for chunk_pos in chunks:
+            chunk = grid.get_chunk(chunk_pos)
+            rect = rects.get(chunk_pos)
+            if chunk and rect and tables.vector_moved[chunk.ids[rect[0]:rect[2] + 1, rect[1]:rect[3] + 1]].any():
+                phases.setdefault((chunk_pos[0] % 2, chunk_pos[1] % 2), []).append(chunk_pos)
+
+        waiting = []
+        for phase_chunks in phases.values():
+            y_offsets = [chunk_pos[1] * self.chunk_size[1] - 1 for chunk_pos in phase_chunks]
+            regions = [rects[chunk_pos] for chunk_pos in phase_chunks]
+
+            if len(phase_chunks) < self.inline_below or self.workers == 1:
+                for chunk_pos, y_offset, region in zip(phase_chunks, y_offsets, regions):
+                    ids, life = grid.get_window(chunk_pos)
+                    moved, stuck = move_window(ids, life, y_offset, rng, region)
+                    if moved:
+                        grid.set_window(chunk_pos, ids, life)
+                    if stuck:
+                        waiting.append((chunk_pos, stuck))
+                continue
+
+            windows = self._buffer(len(phase_chunks))
+            for i, chunk_pos in enumerate(phase_chunks):
+                windows[0, i], windows[1, i] = grid.get_window(chunk_pos)
+
+            if self.pool == None:
+                self.pool = ProcessPoolExecutor(self.workers)
+            batch = -(-len(phase_chunks) // self.workers)
+            futures = []
+            for start in range(0, len(phase_chunks), batch):
+                stop = min(start + batch, len(phase_chunks))
+                futures.append(self.pool.submit(
+                    _move_batch, self.shm.name, windows.shape, start, stop,
+                    y_offsets[start:stop], regions[start:stop], int(rng.integers(0, 2**63))
+                ))
+
+            results = []
+            for future in futures:
+                results.extend(future.result())
+
+            for i, chunk_pos in enumerate(phase_chunks):
+                moved, stuck = results[i]
+                if moved:
+                    grid.set_window(chunk_pos, windows[0, i], windows[1, i])
+                if stuck:
+                    waiting.append((chunk_pos, stuck))
+            del windows # The buffer can't be resized while a view of it exists
+
+        return waiting
+
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown()
+            self.pool = None
+        self._free_buffer()
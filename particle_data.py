@@ -1,155 +1,9 @@
-from math import sqrt
-
-def infect(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    active = False
-    for pos, data in neighbors:
-        if data[0] == part_data[0]:
-            continue
-        simstate.set(pos, part_data)
-        active = True
-
-    return part_data, True, active
-
-def flammable_infect(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    active = False
-    burned = False
-    for pos, data in neighbors:
-        if data[0] == part_data[0]:
-            continue
-
-        if data[0] in hot_parts:
-            burned = True
-        else:
-            simstate.set(pos, part_data)
-        active = True
-
-    if burned:
-        ember = particle_data[10]["created"].copy()
-        ember[0] = 10
-        return ember, True, True
-    return part_data, True, active
-
-def corrode(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    active = False
-
-    powder = particle_data[1]["created"].copy()
-    powder[0] = 1
-    for pos, data in neighbors:
-        if particle_data[data[0]]["type"] == "solid":
-            simstate.set(pos, powder.copy())
-            active = True
-
-    return part_data, True, active
-
-def melt(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    active = False
-
-    for pos, data in neighbors:
-        if data[0] == 16:
-            simstate.set(pos, part_data)
-            active = True
-
-    return part_data, True, active
-
-def _explode(pos, radius, simstate, particle):
-    x, y = pos
-    for i in range(x - radius, x + radius + 1):
-        for j in range(y - radius, y + radius + 1):
-            if sqrt((i - x)**2 + (j - y)**2) <= radius:
-                if j > 0:
-                    simstate.set((i, j), particle.copy())
-
-def bomb(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    if not neighbors:
-        return part_data, True, False
-    exploded = False
-    for pos, data in neighbors:
-        if not data[0] == part_data[0]:
-            exploded = True
-            break
-    
-    if exploded:
-        ember = particle_data[10]["created"].copy()
-        ember[0] = 10
-        
-        radius = part_data[1]
-        _explode(pos, radius, simstate, ember)
-
-        return ember, True, False
-    return part_data, True, False
-
-def lithium(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    if not neighbors:
-        return part_data, True, False
-    exploded = False
-    for pos, data in neighbors:
-        if data[0] == 3:
-            exploded = True
-            break
-
-    if exploded:
-        ember = particle_data[10]["created"].copy()
-        ember[0] = 10
-        _explode(pos, 3, simstate, ember)
-        return ember, True, False
-
-    return part_data, True, False
-
-def fuse(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    if not neighbors:
-        return part_data, True, False
-    exploded = False
-    for pos, data in neighbors:
-        if data[0] in hot_parts:
-            exploded = True
-            break
-
-    if exploded:
-        ember = particle_data[10]["created"].copy()
-        ember[0] = 10
-        _explode(pos, 3, simstate, ember)
-        return ember, True, False
-
-    return part_data, True, False
-
-def flammable(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    if not neighbors:
-        return part_data, True, False
-    burned = False
-    for pos, data in neighbors:
-        if data[0] in hot_parts:
-            burned = True
-            break
-
-    if burned:
-        ember = particle_data[10]["created"].copy()
-        ember[0] = 10
-        return ember, True, False
-
-    return part_data, True, False
-
 def expire(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
     part_data[1] -= 1
     if part_data[1] < 0:
         return part_data, False, False
     return part_data, True, True
 
-def meltable(pos:tuple[int,int], part_data:list, neighbors:list, simstate):
-    if not neighbors:
-        return part_data, True, False
-    melted = False
-    for pos, data in neighbors:
-        if data[0] in hot_parts:
-            melted = True
-            break
-
-    if melted:
-        water = particle_data[3]["created"].copy()
-        water[0] = 3
-        return water, True, False
-
-    return part_data, True, False
-
 type_behaviours = {
     "solid": [],
     "powder":  [
@@ -170,6 +24,7 @@ def new_part(life:int=0):
     return [-1, life]
 
 hot_parts = [10,17]
+blast_part = 10 # What explosions fill their radius with
 
 particle_data = [
     { # 0
@@ -219,7 +74,6 @@ particle_data = [
         "type": "liquid",
         "move_down_chance": 90,
         "movement_chance": 60,
-        "update_func": flammable,
         "created": new_part()
     },
     { # 7
@@ -229,20 +83,17 @@ particle_data = [
         "move_down_chance": 0,
         "movement_chance":30,
         "created": new_part(),
-        "update_func": corrode
     },
     { # 8
         "name": "virus",
         "color": [200,10,10],
         "type": "liquid",
-        "update_func": flammable_infect,
         "created": new_part()
     },
     { # 9
         "name": "bomb",
         "color": [20,200,20],
         "type": "powder",
-        "update_func": bomb,
         "created": new_part(5)
     },
     { # 10
@@ -250,41 +101,37 @@ particle_data = [
         "color": [255,255,200],
         "type": "powder",
         "update_func": expire,
+        "heat": 400,
         "created": new_part(4)
     },
     { # 11
         "name": "strange",
         "color": [100,255,100],
         "type": "solid",
-        "update_func": infect,
         "created": new_part()
     },
     { # 12
         "name": "lithium",
         "color": [240,240,255],
         "type": "solid",
-        "update_func": lithium,
         "created": new_part()
     },
     { # 13
         "name": "fuse",
         "color": [200,200,50],
         "type": "solid",
-        "update_func": fuse,
         "created": new_part()
     },
     { # 14
         "name": "wood",
         "color": [139,69,19],
         "type": "solid",
-        "update_func": flammable,
         "created": new_part()
     },
     { # 15
         "name": "ice",
         "color": [150,200,255],
         "type": "solid",
-        "update_func": meltable,
         "created": new_part()
     },
     { # 16
@@ -298,7 +145,7 @@ particle_data = [
         "color": [255,255,200],
         "type": "liquid",
         "movement_chance": 30,
-        "update_func": melt,
+        "heat": 600,
         "created": new_part()
     },
     { # 18
@@ -310,3 +157,45 @@ particle_data = [
         "created": new_part()
     },
 ]
+
+# Reactions between neighbouring particles, keyed by (type, neighbour type).
+# Checked against all eight neighbours, in the order of boilerplate.neighbor_cords:
+#   "self" / "neighbor": the type the particle / its neighbour turns into
+#   "chance": percent chance per check, 100 if left out
+#   "explode": radius of a blast of blast_part around the neighbour, "life" uses the particle's life
+reactions = {}
+
+def react(part_id:int, neighbor_ids:list, **reaction):
+    for neighbor_id in neighbor_ids:
+        reactions[(part_id, neighbor_id)] = reaction
+
+every_part = range(len(particle_data))
+solid_parts = [part_id for part_id in every_part if particle_data[part_id]["type"] == "solid"]
+
+react(6, hot_parts, self=10) # Oil burns
+react(7, solid_parts, neighbor=1) # ??? corrodes solids into sand
+react(8, [part_id for part_id in every_part if part_id != 8 and part_id not in hot_parts], neighbor=8) # Virus spreads
+react(8, hot_parts, self=10) # and burns
+react(9, [part_id for part_id in every_part if part_id != 9], self=10, explode="life") # Bombs go off on any touch
+react(11, [part_id for part_id in every_part if part_id != 11], neighbor=11) # Strange takes over everything
+react(12, [3], self=10, explode=3) # Lithium explodes in water
+react(13, hot_parts, self=10, explode=3) # Fuses
+react(14, hot_parts, self=10) # Wood burns
+react(15, hot_parts, self=3) # Ice melts
+react(17, [16], neighbor=17) # Lava melts metal
+
+# Heat, used instead of the reactions with hot_parts when Simulation runs with
+# heat=True. "heat" in particle_data is the temperature a particle keeps its cell
+# at. Heat spreads to the surrounding cells and cools off, and a particle in
+# heat_reactions turns into "self" once its cell reaches "at" ("explode" is a
+# radius of a blast of blast_part around it)
+heat_reactions = {}
+
+def react_to_heat(part_id:int, at:float, **reaction):
+    heat_reactions[part_id] = dict(at=at, **reaction)
+
+react_to_heat(6, 40, self=10) # Oil burns
+react_to_heat(8, 40, self=10) # Virus burns
+react_to_heat(13, 40, self=10, explode=3) # Fuses
+react_to_heat(14, 60, self=10) # Wood burns
+react_to_heat(15, 10, self=3) # Ice melts
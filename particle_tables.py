@@ -0,0 +1,114 @@
+import numpy as np
+
+from particle_data import particle_data, type_behaviours, reactions, heat_reactions
+
+# Flat per-type lookup tables compiled from particle_data, so hot loops never
+# touch the particle dicts. Arrays are indexed by type id and have one extra
+# entry at the end, so indexing them with -1 (an empty cell) is safe and gives
+# "nothing": no movement, no update, black.
+
+render_modes = ("solid", "powder", "liquid")
+
+class ParticleTables:
+    def __init__(self, particle_data:list, type_behaviours:dict):
+        count = len(particle_data)
+        self.count = count
+        self.names = [data["name"] for data in particle_data]
+
+        # Every movement any behaviour uses, in the order update_chunk tries them
+        self.directions = []
+        for movements in type_behaviours.values():
+            for movement in movements:
+                if movement not in self.directions:
+                    self.directions.append(movement)
+        self.down_index = self.directions.index((0, -1))
+        self.direction_array = np.array(self.directions)
+
+        self.allowed_moves = np.zeros((count + 1, len(self.directions)), dtype=bool)
+        self.move_down_chance = np.zeros(count + 1, dtype=np.int16)
+        self.movement_chance = np.zeros(count + 1, dtype=np.int16)
+        self.color = np.zeros((count + 1, 3), dtype=np.float32)
+        self.render_mode = np.zeros(count + 1, dtype=np.int8)
+
+        self.has_update = np.zeros(count + 1, dtype=bool) # Has an update_func
+
+        for part_id, data in enumerate(particle_data):
+            for movement in type_behaviours[data["type"]]:
+                self.allowed_moves[part_id, self.directions.index(movement)] = True
+            self.move_down_chance[part_id] = data.get("move_down_chance", 100)
+            self.movement_chance[part_id] = data.get("movement_chance", 100)
+            self.color[part_id] = data["color"]
+            self.render_mode[part_id] = render_modes.index(data.get("render", data["type"]))
+            self.has_update[part_id] = "update_func" in data
+
+        # Reaction rows are (type, neighbour type, type it becomes or None,
+        # neighbour becomes or None, chance, explode radius or "life" or None)
+        reaction = np.full((count + 1, count + 1), -1, dtype=np.int16)
+        self.reaction_rows = []
+        for (part_id, neighbor_id), data in reactions.items():
+            reaction[part_id, neighbor_id] = len(self.reaction_rows)
+            self.reaction_rows.append((
+                part_id, neighbor_id,
+                data.get("self", None), data.get("neighbor", None),
+                data.get("chance", 100), data.get("explode", None)
+            ))
+
+        # Heat, see heat_reactions in particle_data. heat_rows are
+        # (type it becomes or None, explode radius or None) per type
+        self.heat = np.zeros(count + 1, dtype=np.float32)
+        self.ignition = np.full(count + 1, np.inf, dtype=np.float32)
+        self.heat_rows = [None] * (count + 1)
+        for part_id, data in enumerate(particle_data):
+            self.heat[part_id] = data.get("heat", 0)
+        for part_id, data in heat_reactions.items():
+            self.ignition[part_id] = data["at"]
+            self.heat_rows[part_id] = (data.get("self", None), data.get("explode", None))
+
+        # New particle data per type, copy before use
+        self.created = []
+        for part_id, data in enumerate(particle_data):
+            self.created.append([part_id] + data["created"][1:])
+
+        # Property flags
+        self.movable = self.allowed_moves.any(axis=1)
+        self.vector_moved = self.movable & ~self.has_update # Moved by kernels.move_window
+
+        # With the heat field, reacting to heat replaces reacting to hot neighbours
+        self.reactions = Reactions(reaction, self.movable, self.has_update)
+        heated = reaction.copy()
+        heated[np.ix_(np.isfinite(self.ignition), self.heat > 0)] = -1
+        self.heat_reactions = Reactions(heated, self.movable, self.has_update)
+
+        # Plain Python rows for the per-particle loop, where NumPy scalars are slow:
+        # (movements, move_down_chance, movement_chance, update_func or None)
+        self.rows = []
+        for part_id, data in enumerate(particle_data):
+            self.rows.append((
+                type_behaviours[data["type"]],
+                int(self.move_down_chance[part_id]),
+                int(self.movement_chance[part_id]),
+                data.get("update_func", None),
+            ))
+
+# A reaction[type, neighbour type] matrix indexing ParticleTables.reaction_rows
+# (-1 for none), and the lookups Simulation derives from it
+class Reactions:
+    def __init__(self, reaction:np.ndarray, movable:np.ndarray, has_update:np.ndarray):
+        self.reaction = reaction
+        self.lists = reaction.tolist() # For lookups from Python
+        self.reactive = (reaction >= 0).any(axis=1)
+        # Particles that can only change through a reaction, so they only need a
+        # look when a type they react with appears next to them. Movable ones are
+        # left out, they get looked at every tick to be moved anyway.
+        self.trigger = self.reactive & ~movable & ~has_update
+        self.trigger_source = (reaction[self.trigger] >= 0).any(axis=0)
+        # Per source, the set of trigger types it sets off
+        self.triggers = [set(np.nonzero(column & self.trigger)[0].tolist()) for column in (reaction >= 0).T]
+        self.notifies = (self.trigger | self.trigger_source).tolist() # Writes of it concern triggers
+        self.trigger_list = self.trigger.tolist()
+        self.reactive_list = self.reactive.tolist()
+
+def compile_tables():
+    return ParticleTables(particle_data, type_behaviours)
+
+tables = compile_tables()
@@ -0,0 +1,134 @@
+import csv
+import json
+import numpy as np
+from collections import deque
+from time import perf_counter
+
+from particle_tables import tables
+
+# Per tick counters for a Simulation, collected while sim.profiler is set:
+#   sim.profiler = Profiler()
+# Stage times are seconds of wall time. movement is the time spent moving
+# particles, without the update_func calls and grid writes, which have their
+# own stages. Per type counts are lists indexed by type id. population is the
+# number of particles of every type in the world at the end of the tick.
+
+stages = ("bookkeeping", "movement", "update_func", "writes", "triggers", "heat", "explosions")
+counters = ("visited", "moved", "reactions", "population")
+
+class TickProfile:
+    def __init__(self, tick:int, active_chunks:int):
+        self.tick = tick
+        self.active_chunks = active_chunks
+        self.times = dict.fromkeys(stages, 0.0)
+        self.visited = [0] * (tables.count + 1) # Particles the update looked at
+        self.moved = [0] * (tables.count + 1)
+        self.reactions = [0] * (tables.count + 1) # Reactions fired, by the type that reacted
+        self.population = [0] * (tables.count + 1)
+
+    def total_time(self):
+        return sum(self.times.values())
+
+    # {type name: count} of the types with a count
+    def by_type(self, counter:str):
+        return {tables.names[part_id]: count for part_id, count in enumerate(getattr(self, counter)[:tables.count]) if count}
+
+    # Counts every type id in the array ids (empty cells left out) into counter
+    def add_ids(self, counter:str, ids:np.ndarray):
+        counts = getattr(self, counter)
+        for part_id, count in enumerate(np.bincount(ids[ids >= 0], minlength=tables.count + 1).tolist()):
+            counts[part_id] += count
+
+    def to_dict(self):
+        data = {"tick": self.tick, "active_chunks": self.active_chunks, "times": dict(self.times)}
+        for counter in counters:
+            data[counter] = self.by_type(counter)
+        return data
+
+    # One flat CSV row, with a column per stage and per counter and type
+    def to_row(self):
+        row = {"tick": self.tick, "active_chunks": self.active_chunks}
+        for stage in stages:
+            row[f"{stage}_s"] = self.times[stage]
+        for counter in counters:
+            counts = getattr(self, counter)
+            for part_id, name in enumerate(tables.names):
+                row[f"{counter}_{name}"] = counts[part_id]
+        return row
+
+class Profiler:
+    def __init__(self, history:int=600):
+        self.ticks = deque(maxlen=history) # Finished ticks, oldest first
+        self.current = None
+        self.lap_start = 0
+
+    def start_tick(self, tick:int):
+        self.current = TickProfile(tick, 0)
+        self.lap_start = perf_counter()
+        return self.current
+
+    # Adds the time since the last lap (or the start of the tick) to stage
+    def lap(self, stage:str):
+        now = perf_counter()
+        self.current.times[stage] += now - self.lap_start
+        self.lap_start = now
+
+    # population is the per type particle count of the world, like ChunkedGrid.counts
+    def end_tick(self, population:list=None):
+        if population:
+            self.current.population = list(population)
+        times = self.current.times
+        times["movement"] -= times["update_func"] + times["writes"] # They were timed inside it
+        self.ticks.append(self.current)
+        self.current = None
+
+    def last(self):
+        return self.ticks[-1] if self.ticks else None
+
+    # Stage times and counts of the last count ticks added up
+    def totals(self, count:int=None):
+        ticks = list(self.ticks)[-count:] if count else list(self.ticks)
+        total = TickProfile(ticks[-1].tick if ticks else 0, 0)
+        for profile in ticks:
+            total.active_chunks += profile.active_chunks
+            for stage in stages:
+                total.times[stage] += profile.times[stage]
+            for counter in counters:
+                counts = getattr(total, counter)
+                for part_id, count in enumerate(getattr(profile, counter)):
+                    counts[part_id] += count
+        return total
+
+    # Short lines with the per tick averages of the last count ticks, the top
+    # types of every counter first
+    def summary(self, count:int=None, top:int=3):
+        ticks = min(count or len(self.ticks), len(self.ticks))
+        if not ticks:
+            return []
+        total = self.totals(count)
+        lines = [f"Active chunks: {total.active_chunks / ticks:.1f}"]
+        for stage in stages:
+            if total.times[stage]:
+                lines.append(f"{stage}: {total.times[stage] / ticks * 1000:.2f}ms")
+        for counter in counters:
+            counts = sorted(total.by_type(counter).items(), key=lambda item: -item[1])[:top]
+            if counts:
+                lines.append(f"{counter}: " + ", ".join(f"{name} {count / ticks:.0f}" for name, count in counts))
+        return lines
+
+    def dump_csv(self, path:str):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(TickProfile(0, 0).to_row()))
+            writer.writeheader()
+            writer.writerows(profile.to_row() for profile in self.ticks)
+
+    def dump_json(self, path:str):
+        with open(path, "w") as f:
+            json.dump([profile.to_dict() for profile in self.ticks], f, indent=1)
+
+    # Writes CSV or JSON depending on the extension of path
+    def dump(self, path:str):
+        if path.endswith(".json"):
+            self.dump_json(path)
+        else:
+            self.dump_csv(path)
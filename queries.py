@@ -0,0 +1,139 @@
+import math
+import numpy as np
+
+from simulation import ChunkedGrid
+from particle_tables import tables
+
+# Region queries over a ChunkedGrid (sim.sim) for tooling. They go chunk by
+# chunk instead of cell by cell: chunks that don't exist are empty and skipped,
+# chunks a query covers completely are answered from their counts, and the rest
+# from their arrays in bulk. Paged out chunks are read without paging them in.
+# Rects are inclusive world (x0, y0, x1, y1), like everywhere else.
+
+# Yields (chunk_cords, chunk, chunk-local rect) for the chunks holding
+# particles that overlap rect
+def chunks_in_rect(grid:ChunkedGrid, rect:tuple):
+    width, height = grid.chunk_size
+    x0, y0, x1, y1 = rect
+    for chunk_x in range(x0 // width, x1 // width + 1):
+        for chunk_y in range(y0 // height, y1 // height + 1):
+            chunk = grid.peek_chunk((chunk_x, chunk_y))
+            if not chunk:
+                continue
+            left, bottom = chunk_x * width, chunk_y * height
+            local = (max(x0, left) - left, max(y0, bottom) - bottom, min(x1, left + width - 1) - left, min(y1, bottom + height - 1) - bottom)
+            yield (chunk_x, chunk_y), chunk, local
+
+# Particles per type id inside rect, a list like ChunkedGrid.counts
+def count_rect(grid:ChunkedGrid, rect:tuple):
+    counts = [0] * (tables.count + 1)
+    width, height = grid.chunk_size
+    for _, chunk, local in chunks_in_rect(grid, rect):
+        if local == (0, 0, width - 1, height - 1):
+            found = chunk.counts
+        elif hasattr(chunk, "ids"):
+            ids = chunk.ids[local[0]:local[2] + 1, local[1]:local[3] + 1]
+            found = np.bincount(ids[ids >= 0], minlength=tables.count + 1).tolist()
+        else:
+            found = [0] * (tables.count + 1)
+            for _, part in chunk.get_all(local):
+                found[part[0]] += 1
+        counts = [total + count for total, count in zip(counts, found)]
+    return counts
+
+# The world position of the particle of type part_id closest to pos, or None
+# if there is none within max_distance. Chunks are searched nearest first and
+# only if their counts hold part_id, so far away and empty space costs nothing
+def find_nearest(grid:ChunkedGrid, pos:tuple[int,int], part_id:int, max_distance:float=None):
+    width, height = grid.chunk_size
+    px, py = pos
+    candidates = []
+    for chunk_pos, chunk in list(grid.data.get_all()) + [(chunk_pos, None) for chunk_pos in grid.paged]:
+        if chunk and not chunk.counts[part_id]:
+            continue
+        # Squared distance from pos to the closest cell of the chunk
+        left, bottom = chunk_pos[0] * width, chunk_pos[1] * height
+        dx = max(left - px, 0, px - (left + width - 1))
+        dy = max(bottom - py, 0, py - (bottom + height - 1))
+        candidates.append((dx * dx + dy * dy, chunk_pos))
+    candidates.sort()
+
+    best = None
+    best_distance = math.inf if max_distance == None else max_distance * max_distance
+    for chunk_distance, chunk_pos in candidates:
+        if chunk_distance > best_distance:
+            break
+        chunk = grid.peek_chunk(chunk_pos)
+        left, bottom = chunk_pos[0] * width, chunk_pos[1] * height
+        if hasattr(chunk, "ids"):
+            xs, ys = np.nonzero(chunk.ids == part_id)
+            if not len(xs):
+                continue
+            distances = (xs + (left - px)) ** 2 + (ys + (bottom - py)) ** 2
+            i = int(distances.argmin())
+            found, distance = (left + int(xs[i]), bottom + int(ys[i])), int(distances[i])
+        else:
+            found, distance = None, math.inf
+            for (x, y), part in chunk.get_all():
+                cell_distance = (left + x - px) ** 2 + (bottom + y - py) ** 2
+                if part[0] == part_id and cell_distance < distance:
+                    found, distance = (left + x, bottom + y), cell_distance
+        if distance < best_distance or (best == None and distance == best_distance):
+            best, best_distance = found, distance
+    return best
+
+# Walks the cells on the line from start to end, both included, and returns
+# (world pos, part data) of the first one holding a particle, or None. Cells
+# are stepped through one by one inside chunks with particles, empty chunks
+# are crossed in a single step
+def raycast(grid:ChunkedGrid, start:tuple[int,int], end:tuple[int,int]):
+    width, height = grid.chunk_size
+    x, y = start
+    left_x, left_y = abs(end[0] - x), abs(end[1] - y) # Columns and rows still to cross into
+    step_x = 1 if end[0] > x else -1
+    step_y = 1 if end[1] > y else -1
+    # The ray runs from the center of start to the center of end. Measured in
+    # 1 / (2 * left_x * left_y) of its length, it crosses into the next column
+    # at next_x and then every every_x, the same for rows. On a tie the row
+    # goes first. Integers keep the walk exact
+    next_x, every_x = left_y, 2 * left_y
+    next_y, every_y = left_x, 2 * left_x
+
+    chunk_cords, chunk = None, None
+    while True:
+        if (x // width, y // height) != chunk_cords:
+            chunk_cords = (x // width, y // height)
+            chunk = grid.peek_chunk(chunk_cords)
+        if chunk:
+            part = chunk.get((x % width, y % height))
+            if part:
+                return (x, y), part
+            if left_x and (not left_y or next_x < next_y):
+                crossed_x, crossed_y = 1, 0
+            elif left_y:
+                crossed_x, crossed_y = 0, 1
+            else:
+                return None
+        else:
+            # Crossings to the first column and row outside the chunk, and when
+            # they happen, if the ray gets that far
+            left, bottom = chunk_cords[0] * width, chunk_cords[1] * height
+            steps_x = left + width - x if step_x > 0 else x - left + 1
+            steps_y = bottom + height - y if step_y > 0 else y - bottom + 1
+            leave_x = next_x + (steps_x - 1) * every_x if steps_x <= left_x else None
+            leave_y = next_y + (steps_y - 1) * every_y if steps_y <= left_y else None
+            if leave_x == None and leave_y == None:
+                return None # It ends inside the chunk
+            # Every crossing before the one that leaves happens inside the chunk
+            if leave_y == None or (leave_x != None and leave_x < leave_y):
+                crossed_x = steps_x
+                crossed_y = min((leave_x - next_y) // every_y + 1, left_y) if left_y and next_y <= leave_x else 0
+            else:
+                crossed_y = steps_y
+                crossed_x = min((leave_y - next_x + every_x - 1) // every_x, left_x) if left_x and next_x < leave_y else 0
+        x += crossed_x * step_x
+        y += crossed_y * step_y
+        left_x -= crossed_x
+        left_y -= crossed_y
+        next_x += crossed_x * every_x
+        next_y += crossed_y * every_y
@@ -0,0 +1,71 @@
+import json
+
+from simulation import Simulation
+
+# Brush strokes and the lazy loading's sleep and wake calls are the only input a
+# Simulation gets from the Interface, everything else follows from its seed. A
+# Recording logs them with the tick they came before, next to the settings the
+# Simulation was made with, so a session can be run again exactly, with or
+# without a window.
+
+recording_version = 1
+
+class Recording:
+    def __init__(self, settings:dict, events:list=None, ticks:int=0):
+        self.settings = settings # Simulation keyword arguments, seed included
+        self.events = events or [] # [tick, action, *args] in the order they happened
+        self.ticks = ticks # Length of the session
+
+    def add(self, tick:int, action:str, *args):
+        self.events.append([tick, action, *args])
+
+    def brush(self, tick:int, pos:tuple[int,int], part_id:int, size:int):
+        self.add(tick, "brush", pos[0], pos[1], part_id, size)
+
+    def sleep(self, tick:int, chunk_pos:tuple[int,int]):
+        self.add(tick, "sleep", *chunk_pos)
+
+    def wake(self, tick:int, chunk_pos:tuple[int,int]):
+        self.add(tick, "wake", *chunk_pos)
+
+    # A Simulation like the recorded one. Overrides like the engine keep the run
+    # repeatable, but it won't match the recorded session anymore
+    def build(self, **overrides):
+        settings = {**self.settings, **overrides}
+        settings["chunk_size"] = tuple(settings["chunk_size"])
+        return Simulation(**settings)
+
+    def save(self, path:str):
+        with open(path, "w") as f:
+            json.dump({"version": recording_version, "settings": self.settings, "ticks": self.ticks, "events": self.events}, f)
+
+    @staticmethod
+    def load(path:str):
+        with open(path) as f:
+            data = json.load(f)
+        if data["version"] != recording_version:
+            raise ValueError(f"{path} is a version {data['version']} recording, expected version {recording_version}")
+        return Recording(data["settings"], data["events"], data["ticks"])
+
+# Feeds a Recording's events into a Simulation, call apply before every update
+class Replay:
+    def __init__(self, recording:Recording):
+        self.recording = recording
+        self.index = 0 # Next event
+
+    def apply(self, sim:Simulation):
+        events = self.recording.events
+        while self.index < len(events) and events[self.index][0] <= sim.ticks:
+            _, action, *args = events[self.index]
+            if action == "brush":
+                sim.paint_brush((args[0], args[1]), args[2], args[3])
+            elif action == "sleep":
+                sim.sleep_chunk(tuple(args))
+            elif action == "wake":
+                sim.wake_chunk(tuple(args))
+            else:
+                raise ValueError(f"Unknown recorded action {action!r}")
+            self.index += 1
+
+    def done(self, sim:Simulation):
+        return self.index >= len(self.recording.events) and sim.ticks >= self.recording.ticks
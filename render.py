@@ -0,0 +1,128 @@
+import numpy as np
+
+from particle_tables import tables, render_modes
+
+# Builds frames as pixel arrays straight from chunk data, for
+# pygame.surfarray.blit_array. Arrays are indexed [x, y] like surfarray, with
+# y pointing down the screen.
+
+powder_mode = render_modes.index("powder")
+liquid_mode = render_modes.index("liquid")
+
+sin_lookup = np.sin(np.radians(np.arange(360)))
+
+def chunk_ids(chunk, chunk_size:tuple[int,int]):
+    if hasattr(chunk, "ids"):
+        return chunk.ids
+    ids = np.full(chunk_size, -1, dtype=np.int16)
+    for pos, part in chunk.get_all():
+        ids[pos] = part[0]
+    return ids
+
+# Copies tile into frame with its top left corner at (left, top), clipped to the frame
+def paste(frame:np.ndarray, tile:np.ndarray, left:int, top:int):
+    width, height = frame.shape[:2]
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + tile.shape[0], width), min(top + tile.shape[1], height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    frame[x0:x1, y0:y1] = tile[x0 - left:x1 - left, y0 - top:y1 - top]
+
+# x + y in world space for every pixel, origin is the world position of pixel (0, 0)
+def world_sum(shape:tuple[int,int], origin:tuple[int,int]):
+    return (np.arange(shape[0]) + origin[0])[:, None] + (origin[1] - np.arange(shape[1]))[None, :]
+
+def shimmer(world_sum:np.ndarray, frame_counter:int):
+    angles = np.round(frame_counter * 5 + world_sum * 30).astype(np.int64) % 360
+    return (sin_lookup[angles] + 1) / 8 + 0.75
+
+# Brightness per pixel: powders get a fixed dither, liquids shimmer over time
+# unless animate is off, then they are left at full brightness
+def brightness(ids:np.ndarray, origin:tuple[int,int], frame_counter:int, animate:bool=True):
+    sums = world_sum(ids.shape, origin)
+    pixel_modes = tables.render_mode[ids]
+    light = np.ones(ids.shape, dtype=np.float32)
+
+    powder = pixel_modes == powder_mode
+    light[powder] = (sums[powder] % 3) / 8 + 0.75
+
+    liquid = pixel_modes == liquid_mode
+    if animate and liquid.any():
+        light[liquid] = shimmer(sums[liquid], frame_counter)
+    return light
+
+def colorize(ids:np.ndarray, origin:tuple[int,int], frame_counter:int, animate:bool=True):
+    rgb = tables.color[ids] * brightness(ids, origin, frame_counter, animate)[:, :, None]
+    return np.minimum(rgb, 255).astype(np.uint8)
+
+# Keeps a pre-rendered tile per chunk and the last composed frame. A tile is only
+# rebuilt when its chunk's version changed, and only changed tiles are pasted
+# into the frame while the camera stands still. Liquids are stored unlit and get
+# their shimmer applied to the finished frame.
+class TileCache:
+    def __init__(self):
+        self.tiles = {} # chunk_pos -> (chunk, version, rgb tile, liquid tile)
+        self.view = None
+        self.shown = {} # chunk_pos -> (chunk, version) currently in the frame
+
+    def tile(self, grid, chunk_pos:tuple[int,int], chunk):
+        version = getattr(chunk, "version", None)
+        cached = self.tiles.get(chunk_pos)
+        if cached and version != None and cached[0] is chunk and cached[1] == version:
+            return cached[2], cached[3]
+
+        chunk_width, chunk_height = grid.chunk_size
+        ids = chunk_ids(chunk, grid.chunk_size)[:, ::-1]
+        origin = (chunk_pos[0] * chunk_width, chunk_pos[1] * chunk_height + chunk_height - 1)
+        rgb = colorize(ids, origin, 0, animate=False)
+        liquid = tables.render_mode[ids] == liquid_mode
+        self.tiles[chunk_pos] = (chunk, version, rgb, liquid)
+        return rgb, liquid
+
+    def _tile_corner(self, grid, chunk_pos:tuple[int,int]):
+        chunk_width, chunk_height = grid.chunk_size
+        camera_pos, (width, height) = self.view
+        left = chunk_pos[0] * chunk_width - camera_pos[0]
+        top = height - (chunk_pos[1] * chunk_height + chunk_height - 1) - camera_pos[1]
+        return left, top
+
+    def render(self, grid, chunks:list, camera_pos:tuple[int,int], size:tuple[int,int], frame_counter:int):
+        view = (tuple(camera_pos), tuple(size))
+        if view != self.view:
+            self.view = view
+            self.frame = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+            self.liquid = np.zeros(size, dtype=bool)
+            self.sums = world_sum(size, (camera_pos[0], size[1] - camera_pos[1]))
+            self.shown = {}
+
+        chunk_width, chunk_height = grid.chunk_size
+        shown = {}
+        for chunk_pos in chunks:
+            chunk = grid.get_chunk(chunk_pos)
+            if not chunk:
+                continue
+            key = (chunk, getattr(chunk, "version", None))
+            shown[chunk_pos] = key
+            previous = self.shown.get(chunk_pos)
+            if previous and previous[0] is key[0] and previous[1] == key[1] and key[1] != None:
+                continue
+            rgb, liquid = self.tile(grid, chunk_pos, chunk)
+            left, top = self._tile_corner(grid, chunk_pos)
+            paste(self.frame, rgb, left, top)
+            paste(self.liquid, liquid, left, top)
+
+        # Chunks that left the frame or were emptied get cleared
+        for chunk_pos in self.shown.keys() - shown.keys():
+            left, top = self._tile_corner(grid, chunk_pos)
+            paste(self.frame, np.zeros((chunk_width, chunk_height, 3), dtype=np.uint8), left, top)
+            paste(self.liquid, np.zeros((chunk_width, chunk_height), dtype=bool), left, top)
+            self.tiles.pop(chunk_pos, None)
+        self.shown = shown
+
+        if not self.liquid.any():
+            return self.frame
+
+        frame = self.frame.copy()
+        light = shimmer(self.sums[self.liquid], frame_counter)
+        frame[self.liquid] = np.minimum(frame[self.liquid] * light[:, None], 255).astype(np.uint8)
+        return frame
@@ -0,0 +1,54 @@
+# Scripted scenes for headless runs and benchmarks. Scenes are painted with
+# Simulation.paint_rect, the same way the brush places particles
+
+def fill(sim, x_range:tuple[int,int], y_range:tuple[int,int], part_id:int):
+    sim.paint_rect((x_range[0], y_range[0], x_range[1] - 1, y_range[1] - 1), part_id, overwrite=True)
+
+def basin(sim, width:int, height:int):
+    fill(sim, (-1, 0), (1, height), 0)
+    fill(sim, (width, width + 1), (1, height), 0)
+
+def sand_avalanche(sim, size:int=64):
+    fill(sim, (0, size), (size // 2, size * 2), 1)
+
+def water_tank(sim, size:int=64):
+    basin(sim, size, size)
+    fill(sim, (size // 4, size - size // 4), (size, size * 2), 3)
+
+def oil_fire(sim, size:int=64):
+    basin(sim, size, size // 2)
+    fill(sim, (0, size), (1, size // 3), 6)
+    fill(sim, (size // 2 - 2, size // 2 + 2), (size // 2, size // 2 + 4), 17)
+
+def virus_outbreak(sim, size:int=64):
+    basin(sim, size, size // 2)
+    fill(sim, (0, size), (1, size // 3), 3)
+    fill(sim, (size // 2, size // 2 + 2), (size // 3, size // 3 + 2), 8)
+
+def bomb_chain(sim, size:int=64):
+    fill(sim, (0, size), (1, 3), 0)
+    fill(sim, (0, size // 2), (3, 6), 12)
+    fill(sim, (0, size // 2), (8, 10), 3)
+    for x in range(size // 2, size, 6):
+        fill(sim, (x, x + 2), (3, size // 2), 9)
+
+def wood_fire(sim, size:int=64):
+    fill(sim, (0, size), (1, size // 2), 14)
+    fill(sim, (size // 4, size - size // 4), (size // 2, size * 2), 1)
+    fill(sim, (0, 2), (size // 2, size // 2 + 2), 17)
+
+def settled_world(sim, size:int=64):
+    width = size * 8
+    fill(sim, (-width, width), (1, size), 0)
+    fill(sim, (-width, width), (size, size + 4), 1)
+    fill(sim, (0, 4), (size * 2, size * 2 + 16), 1)
+
+scenes = {
+    "sand": sand_avalanche,
+    "water": water_tank,
+    "oil_fire": oil_fire,
+    "virus": virus_outbreak,
+    "bomb_chain": bomb_chain,
+    "wood_fire": wood_fire,
+    "settled": settled_world,
+}
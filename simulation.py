@@ -0,0 +1,1151 @@
+import numpy as np
+from collections import OrderedDict
+from time import perf_counter
+
+from particle_data import particle_data, blast_part
+from particle_tables import tables
+from boilerplate import RandomPool, neighbor_cords, disk_mask
+from kernels import move_window, find_reactions
+from parallel import ParallelMover
+from paging import ChunkStore
+
+class SparseGrid:
+    def __init__(self, data:dict={}):
+        self.data = data.copy()
+
+    def get(self, pos:tuple[int,int]):
+        return self.data.get(pos, None)
+    
+    def set(self, pos:tuple[int,int], data):
+        if data == None:
+            if pos in self.data:
+                self.data.pop(pos)
+            return
+        self.data[pos] = data
+
+    # rect is an optional inclusive (x0, y0, x1, y1) to limit the cells to, only
+    # an optional per type table (like ParticleTables lists) of the types to keep.
+    # Both are checked cell by cell, in the order the cells were added
+    def get_all(self, rect:tuple=None, only:list=None):
+        if rect == None and only == None:
+            return self.data.items()
+        if rect == None:
+            return [(pos, data) for pos, data in self.data.items() if only[data[0]]]
+        x0, y0, x1, y1 = rect
+        if only == None:
+            return [(pos, data) for pos, data in self.data.items() if x0 <= pos[0] <= x1 and y0 <= pos[1] <= y1]
+        return [(pos, data) for pos, data in self.data.items() if x0 <= pos[0] <= x1 and y0 <= pos[1] <= y1 and only[data[0]]]
+
+    def copy(self):
+        return SparseGrid(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+# The chunks of the sparse grid. Next to the cells they keep counts, the number
+# of particles of every type (a list indexed by type id), up to date on writes,
+# and a version like DenseChunk
+class SparseChunk(SparseGrid):
+    def __init__(self, data:dict={}):
+        super().__init__(data)
+        self.version = 0
+        self.recount()
+
+    def set(self, pos:tuple[int,int], data):
+        old = self.data.get(pos)
+        if old:
+            self.counts[old[0]] -= 1
+        if data == None:
+            if old:
+                self.data.pop(pos)
+                self.version += 1
+            return
+        self.counts[data[0]] += 1
+        self.data[pos] = data
+        self.version += 1
+
+    # Rebuilds counts, for when data was written directly
+    def recount(self):
+        self.version += 1
+        self.counts = [0] * (tables.count + 1)
+        for part in self.data.values():
+            self.counts[part[0]] += 1
+
+    # Whether the chunk holds a particle of any of the types in part_ids
+    def holds(self, part_ids:list):
+        counts = self.counts
+        return any(counts[part_id] for part_id in part_ids)
+
+    def copy(self):
+        return SparseChunk(self.data)
+
+class DenseChunk:
+    def __init__(self, size:tuple[int,int]):
+        self.size = size
+        self.ids = np.full(size, -1, dtype=np.int16) # -1 marks an empty cell
+        self.life = np.zeros(size, dtype=np.int16)
+        self.count = 0
+        self.counts = [0] * (tables.count + 1) # Particles per type id
+        self.version = 0 # Bumped on every write so caches know the chunk changed
+
+    def get(self, pos:tuple[int,int]):
+        part_id = self.ids.item(pos)
+        if part_id < 0:
+            return None
+        return [part_id, self.life.item(pos)]
+
+    def set(self, pos:tuple[int,int], data):
+        old_id = self.ids.item(pos)
+        if data == None:
+            if old_id >= 0:
+                self.ids[pos] = -1
+                self.life[pos] = 0
+                self.count -= 1
+                self.counts[old_id] -= 1
+                self.version += 1
+            return
+        if old_id < 0:
+            self.count += 1
+        else:
+            self.counts[old_id] -= 1
+        self.counts[data[0]] += 1
+        self.version += 1
+        self.ids[pos] = data[0]
+        self.life[pos] = data[1]
+
+    # only is an optional per type bool array (like the ParticleTables ones) of the types to keep
+    def get_all(self, rect:tuple=None, only:np.ndarray=None):
+        ids = self.ids if rect == None else self.ids[rect[0]:rect[2] + 1, rect[1]:rect[3] + 1]
+        xs, ys = np.nonzero(ids >= 0 if only is None else only[ids])
+        if rect != None:
+            xs += rect[0]
+            ys += rect[1]
+        xs, ys = xs.tolist(), ys.tolist()
+        ids = self.ids[xs, ys].tolist()
+        life = self.life[xs, ys].tolist()
+        return [((x, y), [part_id, part_life]) for x, y, part_id, part_life in zip(xs, ys, ids, life)]
+
+    def copy(self):
+        chunk = DenseChunk.__new__(DenseChunk)
+        chunk.size = self.size
+        chunk.ids = self.ids.copy()
+        chunk.life = self.life.copy()
+        chunk.count = self.count
+        chunk.counts = self.counts.copy()
+        chunk.version = self.version
+        return chunk
+
+    # A chunk that uses the given planes as its own, without copying them.
+    # counts can be passed in if they are known already
+    @staticmethod
+    def from_arrays(ids:np.ndarray, life:np.ndarray, counts:list=None):
+        chunk = DenseChunk.__new__(DenseChunk)
+        chunk.size = ids.shape
+        chunk.ids = ids
+        chunk.life = life
+        if counts == None:
+            chunk.counts = [0] * (tables.count + 1)
+            chunk.recount()
+        else:
+            chunk.counts = counts
+            chunk.count = sum(counts)
+        chunk.version = 0
+        return chunk
+
+    # Rebuilds count and counts after the planes were written in bulk. Returns
+    # the change of every type's count
+    def recount(self):
+        counts = np.bincount(self.ids[self.ids >= 0], minlength=tables.count + 1).tolist()
+        change = [new - old for new, old in zip(counts, self.counts)]
+        self.counts = counts
+        self.count = sum(counts)
+        return change
+
+    def holds(self, part_ids:list):
+        counts = self.counts
+        return any(counts[part_id] for part_id in part_ids)
+
+    def __len__(self):
+        return self.count
+
+class ChunkedGrid:
+    def __init__(self, chunk_size:tuple[int,int]=(16,16), data:dict={}):
+        self.data = SparseGrid(data)
+        self.chunk_size = chunk_size
+        # Particles per type id in the whole grid, paged out chunks included,
+        # kept up to date by the writes like the counts of every chunk
+        self.counts = [0] * (tables.count + 1)
+        # Called as on_change(chunk_cords, x0, y0, x1, y1, retyped) with the
+        # inclusive chunk-local rect of cells that a write actually changed.
+        # retyped is False if only their life changed
+        self.on_change = None
+        # While changes is a dict, set collects the changed cells in it instead
+        # of calling on_change, as chunk -> [x0, y0, x1, y1, retyped], so a
+        # batch of writes is reported with one on_change per chunk by
+        # flush_changes. The bulk writes always call on_change right away
+        self.changes = None
+
+        # Chunks paged out to a paging.ChunkStore -> their slot in it. Any access
+        # to one of them pages it back in and calls on_page_in(chunk_cords)
+        self.paged = {}
+        self.store = None
+        self.on_page_in = None
+        self.recount()
+
+    # Rebuilds counts from the chunks, for when chunks were put in data directly
+    def recount(self):
+        counts = [0] * (tables.count + 1)
+        for _, chunk in self.data.get_all():
+            counts = [total + count for total, count in zip(counts, chunk.counts)]
+        for chunk_pos in self.paged:
+            chunk = self.peek_chunk(chunk_pos)
+            counts = [total + count for total, count in zip(counts, chunk.counts)]
+        self.counts = counts
+
+    def add_counts(self, change:list):
+        self.counts = [total + count for total, count in zip(self.counts, change)]
+
+    def _get_chunk_cords(self,pos:tuple[int,int]):
+        x, y = pos
+        chunk_cords = x // self.chunk_size[0], y // self.chunk_size[1]
+        subchunk_cords = (x % self.chunk_size[0]), (y % self.chunk_size[1])
+        return chunk_cords, subchunk_cords
+
+    def get(self,pos:tuple[int,int]):
+        chunk_cords, subchunk_cords = self._get_chunk_cords(pos)
+        # Chunks are checked against None rather than for being empty, which is
+        # a __len__ call, as get and set run for nearly every cell a tick
+        chunk = self.data.data.get(chunk_cords)
+        if chunk == None and self.paged:
+            chunk = self.get_chunk(chunk_cords)
+        if chunk != None:
+            return chunk.get(subchunk_cords)
+        return None
+
+    def get_chunk(self, pos:tuple[int,int]):
+        chunk = self.data.get(pos)
+        if not chunk and pos in self.paged:
+            chunk = self.page_in(pos)
+        return chunk
+
+    # Like get_chunk, but a paged out chunk is read from the store without paging
+    # it in, so it is for reading only
+    def peek_chunk(self, pos:tuple[int,int]):
+        chunk = self.data.get(pos)
+        if not chunk and pos in self.paged:
+            chunk = DenseChunk.from_arrays(*self.store.read(self.paged[pos]))
+        return chunk
+
+    def set(self,pos:tuple[int,int], data):
+        chunk_cords, subchunk_cords = self._get_chunk_cords(pos)
+        chunk = self.data.data.get(chunk_cords)
+        if chunk == None and self.paged:
+            chunk = self.get_chunk(chunk_cords)
+        retyped = True
+        if chunk == None:
+            if data == None:
+                return
+            chunk = self._new_chunk()
+            chunk.set(subchunk_cords, data)
+            self.data.set(chunk_cords,chunk)
+            self.counts[data[0]] += 1
+        else:
+            old = chunk.get(subchunk_cords)
+            if old == data:
+                return # Nothing changed
+            retyped = not old or not data or old[0] != data[0]
+            if retyped:
+                if old:
+                    self.counts[old[0]] -= 1
+                if data:
+                    self.counts[data[0]] += 1
+            chunk.set(subchunk_cords, data)
+            if data == None and not chunk:
+                self.data.set(chunk_cords, None)
+
+        if self.changes != None:
+            x, y = subchunk_cords
+            rect = self.changes.get(chunk_cords)
+            if rect:
+                if x < rect[0]:
+                    rect[0] = x
+                elif x > rect[2]:
+                    rect[2] = x
+                if y < rect[1]:
+                    rect[1] = y
+                elif y > rect[3]:
+                    rect[3] = y
+                rect[4] = rect[4] or retyped
+            else:
+                self.changes[chunk_cords] = [x, y, x, y, retyped]
+        elif self.on_change:
+            self.on_change(chunk_cords, *subchunk_cords, *subchunk_cords, retyped)
+
+    def flush_changes(self):
+        changes = self.changes
+        self.changes = {}
+        if self.on_change:
+            for chunk_cords, (x0, y0, x1, y1, retyped) in changes.items():
+                self.on_change(chunk_cords, x0, y0, x1, y1, retyped)
+
+    # Writes data into every cell of a chunk where the chunk-sized bool mask is
+    # set, with a single on_change for the whole chunk. With only_empty, cells
+    # that hold a particle are left alone
+    def fill_chunk(self, chunk_cords:tuple[int,int], mask:np.ndarray, data, only_empty:bool=False):
+        chunk = self.get_chunk(chunk_cords)
+        if not chunk:
+            if data == None:
+                return
+            chunk = self._new_chunk()
+            self.data.set(chunk_cords, chunk)
+
+        changed = []
+        retyped = False
+        for pos in zip(*np.nonzero(mask)):
+            pos = (int(pos[0]), int(pos[1]))
+            old = chunk.get(pos)
+            if old == data or (old and only_empty):
+                continue
+            retyped = retyped or not old or not data or old[0] != data[0]
+            if old:
+                self.counts[old[0]] -= 1
+            if data:
+                self.counts[data[0]] += 1
+            chunk.set(pos, None if data == None else data.copy())
+            changed.append(pos)
+        if not chunk:
+            self.data.set(chunk_cords, None)
+
+        if changed and self.on_change:
+            xs, ys = zip(*changed)
+            self.on_change(chunk_cords, min(xs), min(ys), max(xs), max(ys), retyped)
+
+    # Splits an array whose [0, 0] lies at the world position origin by chunk.
+    # Yields (chunk_cords, chunk slices, array slices) for every chunk it covers
+    def chunk_slices(self, origin:tuple[int,int], shape:tuple[int,int]):
+        width, height = self.chunk_size
+        x0, y0 = origin
+        x1, y1 = x0 + shape[0] - 1, y0 + shape[1] - 1
+        for chunk_x in range(x0 // width, x1 // width + 1):
+            for chunk_y in range(y0 // height, y1 // height + 1):
+                left, bottom = chunk_x * width, chunk_y * height
+                cx0, cy0 = max(x0, left), max(y0, bottom)
+                cx1, cy1 = min(x1, left + width - 1), min(y1, bottom + height - 1)
+                yield (
+                    (chunk_x, chunk_y),
+                    (slice(cx0 - left, cx1 - left + 1), slice(cy0 - bottom, cy1 - bottom + 1)),
+                    (slice(cx0 - x0, cx1 - x0 + 1), slice(cy0 - y0, cy1 - y0 + 1))
+                )
+
+    # Writes data into every cell where mask is set. mask is indexed [x, y] and
+    # its [0, 0] lies at the world position origin. Each chunk it covers is
+    # written in one go with fill_chunk
+    def fill_mask(self, origin:tuple[int,int], mask:np.ndarray, data, only_empty:bool=False):
+        for chunk_cords, chunk_area, mask_area in self.chunk_slices(origin, mask.shape):
+            if not mask[mask_area].any():
+                continue
+            chunk_mask = np.zeros(self.chunk_size, dtype=bool)
+            chunk_mask[chunk_area] = mask[mask_area]
+            self.fill_chunk(chunk_cords, chunk_mask, data, only_empty)
+
+    def _new_chunk(self):
+        return SparseChunk()
+    
+    def copy(self):
+        chunks_copy_data = {}
+        for pos, chunk in self.data.get_all():
+            chunks_copy_data[pos] = chunk.copy()
+
+        return type(self)(self.chunk_size, chunks_copy_data)
+
+# Same API as ChunkedGrid, but every chunk is a pair of fixed-size NumPy planes
+# (type id and life) instead of a dict of lists, so a cell costs 4 bytes
+class DenseChunkedGrid(ChunkedGrid):
+    def _new_chunk(self):
+        return DenseChunk(self.chunk_size)
+
+    # Moves a chunk out of memory into the store
+    def page_out(self, chunk_cords:tuple[int,int]):
+        chunk = self.data.get(chunk_cords)
+        if not chunk:
+            return
+        self.paged[chunk_cords] = self.store.write(chunk.ids, chunk.life)
+        self.data.set(chunk_cords, None)
+
+    def page_in(self, chunk_cords:tuple[int,int]):
+        slot = self.paged.pop(chunk_cords)
+        chunk = DenseChunk.from_arrays(*self.store.read(slot))
+        self.store.release(slot)
+        self.data.set(chunk_cords, chunk)
+        if self.on_page_in:
+            self.on_page_in(chunk_cords)
+        return chunk
+
+    def fill_chunk(self, chunk_cords:tuple[int,int], mask:np.ndarray, data, only_empty:bool=False):
+        chunk = self.get_chunk(chunk_cords)
+        if not chunk:
+            if data == None:
+                return
+            chunk = self._new_chunk()
+            self.data.set(chunk_cords, chunk)
+
+        if only_empty:
+            mask = mask & (chunk.ids < 0)
+        part_id, life = (-1, 0) if data == None else data
+        retyped_cells = mask & (chunk.ids != part_id)
+        changed = retyped_cells | (mask & (chunk.life != life))
+        if changed.any():
+            chunk.ids[changed] = part_id
+            chunk.life[changed] = life
+            self.add_counts(chunk.recount())
+            chunk.version += 1
+        if not chunk:
+            self.data.set(chunk_cords, None)
+
+        if self.on_change and changed.any():
+            xs, ys = np.nonzero(changed)
+            self.on_change(chunk_cords, int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()), bool(retyped_cells.any()))
+
+    def _window_slices(self, offset:tuple[int,int], border:int):
+        src, dst = [], []
+        for o, n in zip(offset, self.chunk_size):
+            if o < 0:
+                src.append(slice(n - border, n))
+                dst.append(slice(0, border))
+            elif o > 0:
+                src.append(slice(0, border))
+                dst.append(slice(border + n, border * 2 + n))
+            else:
+                src.append(slice(0, n))
+                dst.append(slice(border, border + n))
+        return tuple(src), tuple(dst)
+
+    # Copy a chunk and a border of its neighbours into one pair of arrays
+    def get_window(self, chunk_cords:tuple[int,int], border:int=1):
+        shape = (self.chunk_size[0] + border * 2, self.chunk_size[1] + border * 2)
+        ids = np.full(shape, -1, dtype=np.int16)
+        life = np.zeros(shape, dtype=np.int16)
+        for offset in window_offsets:
+            chunk = self.get_chunk((chunk_cords[0] + offset[0], chunk_cords[1] + offset[1]))
+            if not chunk:
+                continue
+            src, dst = self._window_slices(offset, border)
+            ids[dst] = chunk.ids[src]
+            life[dst] = chunk.life[src]
+        return ids, life
+
+    # Write a window from get_window back, touching only the chunks that changed
+    def set_window(self, chunk_cords:tuple[int,int], ids:np.ndarray, life:np.ndarray, border:int=1):
+        for offset in window_offsets:
+            pos = (chunk_cords[0] + offset[0], chunk_cords[1] + offset[1])
+            src, dst = self._window_slices(offset, border)
+            chunk = self.get_chunk(pos)
+            if not chunk:
+                changed = ids[dst] >= 0
+                if not changed.any():
+                    continue
+                retyped = True
+                chunk = self._new_chunk()
+                self.data.set(pos, chunk)
+            else:
+                retyped_cells = chunk.ids[src] != ids[dst]
+                changed = retyped_cells | (chunk.life[src] != life[dst])
+                if not changed.any():
+                    continue
+                retyped = bool(retyped_cells.any())
+
+            chunk.ids[src] = ids[dst]
+            chunk.life[src] = life[dst]
+            if retyped:
+                self.add_counts(chunk.recount())
+            chunk.version += 1
+            if not chunk:
+                self.data.set(pos, None)
+
+            if self.on_change:
+                xs, ys = np.nonzero(changed)
+                x0, y0 = src[0].start, src[1].start
+                self.on_change(pos, x0 + int(xs.min()), y0 + int(ys.min()), x0 + int(xs.max()), y0 + int(ys.max()), retyped)
+
+window_offsets = [(x, y) for x in (-1, 0, 1) for y in (-1, 0, 1)]
+
+# "particle" moves particles one at a time, "vector" moves powders and liquids
+# a chunk at a time with kernels.move_window, "parallel" does the same on a
+# process pool (see parallel.py)
+engines = ("particle", "vector", "parallel")
+
+class Simulation:
+    def __init__(self, chunk_size:tuple[int,int], lazy:bool=True, lazy_range:int=2, dense:bool=None, engine:str="particle", workers:int=None, seed:int=None, event_triggers:bool=True, heat:bool=False, max_cold_chunks:int=None, page_file:str=None) -> None:
+        self.lazy = lazy
+        self.lazy_range = lazy_range
+
+        if engine not in engines:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {engines}")
+        # Without dense the dict based grid is used, which is the faster one for
+        # the particle engine, unless something that needs the dense grid is on
+        if dense == None:
+            dense = engine != "particle" or heat or max_cold_chunks != None
+        if engine != "particle" and not dense:
+            raise ValueError(f"The {engine} engine needs the dense grid")
+        if heat and not dense:
+            raise ValueError("The heat field needs the dense grid")
+        if max_cold_chunks != None and not dense:
+            raise ValueError("Paging chunks out needs the dense grid")
+        self.engine = engine
+        self.random = RandomPool(seed)
+        self.ticks = 0 # Updates run so far
+        self.profiler = None # A profiling.Profiler to collect per tick counters in
+        self.tracer = None # A tracing.Tracer to record a timeline in
+        self.mover = None
+        if engine == "parallel":
+            self.mover = ParallelMover(chunk_size, workers)
+
+        self.chunk_size = chunk_size
+        self.dense = dense
+        if dense:
+            self.sim = DenseChunkedGrid(self.chunk_size)
+        else:
+            self.sim = ChunkedGrid(self.chunk_size)
+        
+        # Every write that changes a cell marks it and its neighbours dirty, also
+        # across a chunk border, and the dirty cells are collected as one rect per
+        # chunk until the next tick. Only chunks with a dirty rect wake up, and
+        # only update the cells inside it, so a chunk sleeps as soon as a tick
+        # leaves it unchanged. Particles that could have moved but didn't mark
+        # themselves dirty again.
+        self.active = {} # chunk -> inclusive (x0, y0, x1, y1) to update this tick
+        self.dirty = {} # chunk -> rect collecting changes for the next tick
+        self.unloaded = set() # Chunks put to sleep by the lazy loading in Interface
+
+        # With event_triggers, particles that only change through reactions
+        # (Reactions.trigger) are left out of the chunk updates. Writing one, or
+        # writing a type it reacts with next to it, queues it for update_triggers
+        # at the end of the tick.
+        self.event_triggers = event_triggers
+        self.reactions = tables.heat_reactions if heat else tables.reactions
+        # Types react_chunk applies the reactions of
+        reactions = self.reactions
+        self.reacting = reactions.reactive & ~reactions.trigger if event_triggers else reactions.reactive
+        # Types update_chunk has to look at one by one. Inert ones like stone
+        # never change on their own, the vector engines move plain powders and
+        # liquids in move_window, and triggers wait for update_triggers. Dense
+        # chunks find them with one mask over their type plane and never list
+        # the rest. Sparse chunks still walk every cell to drop the rest, since
+        # their dict order is their update order, so they only gain when their
+        # counts hold none of these types and they are skipped as a whole
+        visit = tables.has_update.copy() if engine != "particle" else tables.movable | tables.has_update
+        if not dense:
+            visit |= reactions.reactive # Dense chunks react in bulk in react_chunk
+        if event_triggers:
+            visit &= ~reactions.trigger
+        self.visit = visit if dense else visit.tolist()
+        # The same as type id lists, to check the counts of a chunk for them
+        self.visit_ids = np.nonzero(visit)[0].tolist()
+        self.reacting_ids = np.nonzero(self.reacting[:tables.count])[0].tolist()
+        self.trigger_ids = np.nonzero(reactions.trigger[:tables.count])[0].tolist()
+        self.heat_ids = np.nonzero(tables.heat[:tables.count] > 0)[0].tolist()
+        self.watchers = {} # chunk -> trigger type ids it may hold, rechecked when it changes
+        self.triggered = set() # World positions of watchers to evaluate this tick
+        self.explosions = [] # (pos, radius) of blasts to write at the end of the tick
+
+        # With heat, particles react to the temperature of their cell instead of
+        # to hot neighbours (see heat_reactions in particle_data)
+        self.heat = heat
+        self.temperature = {} # chunk -> temperature per cell, for chunks that are warm
+        self.hot_chunks = set() # Chunks with particles that give off heat
+        self.heat_spread = 0.2 # Share of the difference to each neighbour that flows per tick
+        self.heat_loss = 0.97 # Share of its heat a cell keeps per tick
+        self.min_temperature = 1 # Chunks cooler than this everywhere are dropped
+        self.sim.on_change = self.mark_dirty
+
+        # With max_cold_chunks, unloaded chunks are paged out to a memory-mapped
+        # file (page_file, or a temporary one) once more than that many of them
+        # are in memory, least recently used first. Reading one, because the
+        # camera or an active neighbour reached it, pages it back in.
+        self.max_cold_chunks = max_cold_chunks
+        self.cold = OrderedDict() # Unloaded chunks in memory, least recently used first
+        if max_cold_chunks != None:
+            self.sim.store = ChunkStore(chunk_size, page_file)
+            self.sim.on_page_in = self.touch_cold
+
+    def set_pos(self, pos:tuple[int,int], part_id:int):
+        if part_id == None:
+            part_dat = None
+        else:
+            part_dat:list = particle_data[part_id]["created"].copy()
+            part_dat[0] = part_id
+        self.sim.set(pos, part_dat)
+
+    # Places part_id (None erases) in every cell where mask is set, with mask
+    # indexed [x, y] and its [0, 0] at the world position origin. Each chunk is
+    # written once. Unless overwrite is set, painting skips occupied cells.
+    # Rows below y = 1 are left alone, like the brush always did
+    def paint_mask(self, origin:tuple[int,int], mask:np.ndarray, part_id:int, overwrite:bool=False):
+        origin, mask = self.clip_floor(origin, mask)
+        if mask.size == 0:
+            return
+        data = None if part_id == None else tables.created[part_id]
+        self.sim.fill_mask(origin, mask, data, only_empty=not overwrite and data != None)
+
+    # Paints the inclusive world rect (x0, y0, x1, y1)
+    def paint_rect(self, rect:tuple, part_id:int, overwrite:bool=False):
+        x0, y0, x1, y1 = rect
+        if x1 < x0 or y1 < y0:
+            return
+        self.paint_mask((x0, y0), np.ones((x1 - x0 + 1, y1 - y0 + 1), dtype=bool), part_id, overwrite)
+
+    def paint_circle(self, center:tuple[int,int], radius:int, part_id:int, overwrite:bool=False):
+        self.paint_mask((center[0] - radius, center[1] - radius), disk_mask(radius), part_id, overwrite)
+
+    # The square brush of the Interface, size cells around pos
+    def paint_brush(self, pos:tuple[int,int], part_id:int, size:int):
+        self.paint_rect((pos[0] - size, pos[1] - size, pos[0] + size, pos[1] + size), part_id)
+
+    # Cuts the rows below y = 1 off a mask whose [0, 0] lies at origin
+    def clip_floor(self, origin:tuple[int,int], mask:np.ndarray):
+        if origin[1] < 1:
+            mask = mask[:, 1 - origin[1]:]
+            origin = (origin[0], 1)
+        return origin, mask
+
+    def get_chunks(self):
+        return self.sim.data.get_all()
+
+    # {type name: particles of it} in the whole world, read from the counts
+    # the grid keeps, so it never looks at a cell
+    def population(self):
+        return {tables.names[part_id]: count for part_id, count in enumerate(self.sim.counts[:tables.count]) if count}
+
+    def update(self):
+        # Chunks are updated in place. Each active chunk snapshots its own cells
+        # before moving them, so sleeping and unloaded chunks are never copied
+        profiler, tracer = self.profiler, self.tracer
+        if profiler:
+            profiler.start_tick(self.ticks)
+        if tracer:
+            tracer.start_tick(self.ticks)
+        self.commit_dirty()
+        old_active = list(self.active.keys())
+        if profiler:
+            profiler.current.active_chunks = len(old_active)
+        self.end_stage("bookkeeping")
+        if self.mover:
+            if tracer:
+                start = tracer.now()
+            for chunk_pos, waiting in self.mover.move_chunks(self.sim, old_active, self.random.generator, self.active):
+                self.mark_local(chunk_pos, waiting)
+            if tracer:
+                tracer.add("move_chunks", start, {"chunks": len(old_active)})
+
+        # The single cell writes of a chunk update are marked dirty together
+        # once it is done, instead of one by one
+        self.sim.changes = {}
+        for chunk_pos in old_active:
+            if tracer:
+                start = tracer.now()
+            self.update_chunk(chunk_pos, self.sim)
+            self.sim.flush_changes()
+            if tracer:
+                tracer.add("update_chunk", start, {"chunk": chunk_pos})
+        self.sim.changes = None
+        self.end_stage("movement")
+        triggered = len(self.triggered)
+        self.update_triggers()
+        self.end_stage("triggers", triggered=triggered)
+        if self.heat:
+            self.update_heat()
+            self.end_stage("heat", warm_chunks=len(self.temperature))
+        blasts = len(self.explosions)
+        self.flush_explosions()
+        self.end_stage("explosions", blasts=blasts)
+        self.trim_cold()
+        self.ticks += 1
+        self.end_stage("bookkeeping")
+        if profiler:
+            profiler.end_tick(self.sim.counts)
+        if tracer:
+            tracer.end_tick(active_chunks=len(old_active))
+
+    # Closes a stage of update for the profiler and the tracer, args go into the trace
+    def end_stage(self, stage:str, **args):
+        if self.profiler:
+            self.profiler.lap(stage)
+        if self.tracer:
+            self.tracer.lap(stage, args)
+
+    # Grid callback for changed cells, they and their neighbours need an update
+    def mark_dirty(self, chunk_cords:tuple[int,int], x0:int, y0:int, x1:int, y1:int, retyped:bool=True):
+        left = chunk_cords[0] * self.chunk_size[0]
+        bottom = chunk_cords[1] * self.chunk_size[1]
+        self.mark_region(left + x0 - 1, bottom + y0 - 1, left + x1 + 1, bottom + y1 + 1)
+        if self.event_triggers and retyped:
+            self.notify_triggers(chunk_cords, x0, y0, x1, y1)
+
+    # Marks a chunk-local rect dirty without spilling into neighbours
+    def mark_local(self, chunk_cords:tuple[int,int], rect:tuple):
+        left = chunk_cords[0] * self.chunk_size[0]
+        bottom = chunk_cords[1] * self.chunk_size[1]
+        self.mark_region(left + rect[0], bottom + rect[1], left + rect[2], bottom + rect[3])
+
+    # Marks an inclusive world rect dirty, split over the chunks it covers
+    def mark_region(self, x0:int, y0:int, x1:int, y1:int):
+        width, height = self.chunk_size
+        first_x, last_x = x0 // width, x1 // width
+        first_y, last_y = y0 // height, y1 // height
+        dirty = self.dirty
+        for chunk_x in range(first_x, last_x + 1):
+            left = chunk_x * width
+            rx0 = x0 - left if chunk_x == first_x else 0
+            rx1 = x1 - left if chunk_x == last_x else width - 1
+            for chunk_y in range(first_y, last_y + 1):
+                bottom = chunk_y * height
+                ry0 = y0 - bottom if chunk_y == first_y else 0
+                ry1 = y1 - bottom if chunk_y == last_y else height - 1
+                old = dirty.get((chunk_x, chunk_y))
+                if old:
+                    dirty[(chunk_x, chunk_y)] = (
+                        old[0] if old[0] < rx0 else rx0, old[1] if old[1] < ry0 else ry0,
+                        old[2] if old[2] > rx1 else rx1, old[3] if old[3] > ry1 else ry1
+                    )
+                else:
+                    dirty[(chunk_x, chunk_y)] = (rx0, ry0, rx1, ry1)
+
+    # Queues the trigger particles in a changed chunk-local rect, and the ones
+    # next to a newly written type that triggers them
+    def notify_triggers(self, chunk_cords:tuple[int,int], x0:int, y0:int, x1:int, y1:int):
+        chunk = self.sim.get_chunk(chunk_cords)
+        if not chunk:
+            return
+        if x0 == x1 and y0 == y1:
+            part = chunk.get((x0, y0))
+            if not part or not self.reactions.notifies[part[0]]:
+                return
+            cells = [((x0, y0), part[0])]
+        elif hasattr(chunk, "ids"):
+            region = chunk.ids[x0:x1 + 1, y0:y1 + 1]
+            xs, ys = np.nonzero(self.reactions.trigger[region] | self.reactions.trigger_source[region])
+            cells = [((x + x0, y + y0), part_id) for x, y, part_id in zip(xs.tolist(), ys.tolist(), region[xs, ys].tolist())]
+        else:
+            cells = [(pos, part[0]) for pos, part in chunk.get_all((x0, y0, x1, y1))]
+
+        width, height = self.chunk_size
+        left = chunk_cords[0] * width
+        bottom = chunk_cords[1] * height
+        trigger = self.reactions.trigger_list
+        for pos, part_id in cells:
+            if trigger[part_id]:
+                self.watchers.setdefault(chunk_cords, set()).add(part_id)
+                self.triggered.add((left + pos[0], bottom + pos[1]))
+
+            triggers = self.reactions.triggers[part_id]
+            if not triggers:
+                continue
+            # Only look at the neighbours if a chunk they are in holds a type this one triggers
+            x, y = pos
+            if 0 < x < width - 1 and 0 < y < height - 1:
+                types = self.watchers.get(chunk_cords)
+                near = types and not triggers.isdisjoint(types)
+            else:
+                near = False
+                for chunk_x in range((left + x - 1) // width, (left + x + 1) // width + 1):
+                    for chunk_y in range((bottom + y - 1) // height, (bottom + y + 1) // height + 1):
+                        types = self.watchers.get((chunk_x, chunk_y))
+                        if types and not triggers.isdisjoint(types):
+                            near = True
+            if not near:
+                continue
+            x += left
+            y += bottom
+            for relpos in neighbor_cords:
+                real_pos = (x + relpos[0], y + relpos[1])
+                part_at_pos = self.sim.get(real_pos)
+                if part_at_pos and part_at_pos[0] in triggers:
+                    self.triggered.add(real_pos)
+
+    # Evaluates the watchers queued by notify_triggers. Their writes queue the
+    # next ones, which wait for the next tick.
+    def update_triggers(self):
+        triggered = self.triggered
+        self.triggered = set()
+        simstate = self.sim
+        for pos in triggered:
+            chunk_cords, _ = simstate._get_chunk_cords(pos)
+            if chunk_cords in self.unloaded:
+                self.triggered.add(pos) # Kept until the chunk is loaded again
+                continue
+            part_data = simstate.get(pos)
+            if not part_data or not self.reactions.trigger_list[part_data[0]]:
+                continue
+
+            neighbors = {}
+            for relpos in neighbor_cords:
+                real_pos = (pos[0] + relpos[0], pos[1] + relpos[1])
+                part_at_pos = simstate.get(real_pos)
+                if part_at_pos:
+                    neighbors[real_pos] = part_at_pos
+            self.react(pos, part_data[0], neighbors)
+
+    # Applies reaction (an index into tables.reaction_rows) between the particle
+    # at pos and its neighbour, if both still are the types it is for.
+    # Returns whether it happened
+    def apply_reaction(self, pos:tuple[int,int], neighbor_pos:tuple[int,int], reaction:int):
+        part_id, neighbor_id, becomes, neighbor_becomes, chance, radius = tables.reaction_rows[reaction]
+        simstate = self.sim
+        part = simstate.get(pos)
+        neighbor = simstate.get(neighbor_pos)
+        if not part or part[0] != part_id or not neighbor or neighbor[0] != neighbor_id:
+            return False
+        if chance < 100 and self.random.randint(100) >= chance:
+            # Lost the roll, try again next tick
+            self.mark_region(*pos, *pos)
+            if self.event_triggers and self.reactions.trigger_list[part_id]:
+                self.triggered.add(pos)
+            return False
+
+        if neighbor_becomes != None:
+            simstate.set(neighbor_pos, tables.created[neighbor_becomes].copy())
+        if radius != None:
+            self.explode(neighbor_pos, part[1] if radius == "life" else radius)
+        if becomes != None:
+            simstate.set(pos, tables.created[becomes].copy())
+        if self.profiler:
+            self.profiler.current.reactions[part_id] += 1
+        return True
+
+    # Applies the reactions of the particle at pos with its neighbors, a dict of
+    # {pos: part data}. Returns whether the particle itself got replaced
+    def react(self, pos:tuple[int,int], part_id:int, neighbors:dict):
+        row = self.reactions.lists[part_id]
+        reacted = False
+        for relpos in neighbor_cords:
+            neighbor_pos = (pos[0] + relpos[0], pos[1] + relpos[1])
+            neighbor = neighbors.get(neighbor_pos)
+            if neighbor and row[neighbor[0]] >= 0:
+                reacted = self.apply_reaction(pos, neighbor_pos, row[neighbor[0]]) or reacted
+        if not reacted:
+            return False
+        part_data = self.sim.get(pos)
+        return not part_data or part_data[0] != part_id
+
+    # Same as react, for every particle inside rect of a dense chunk at once.
+    # Returns how many reactions it tried
+    def react_chunk(self, chunk_cords:tuple[int,int], rect:tuple):
+        chunk = self.sim.get_chunk(chunk_cords)
+        if not chunk or not chunk.holds(self.reacting_ids) or not self.reacting[chunk.ids[rect[0]:rect[2] + 1, rect[1]:rect[3] + 1]].any():
+            return 0
+        ids, _ = self.sim.get_window(chunk_cords)
+        left = chunk_cords[0] * self.chunk_size[0]
+        bottom = chunk_cords[1] * self.chunk_size[1]
+        found = find_reactions(ids, self.reactions.reaction, self.reacting, rect)
+        for x, y, index, reaction in found:
+            relpos = neighbor_cords[index]
+            pos = (left + x, bottom + y)
+            self.apply_reaction(pos, (pos[0] + relpos[0], pos[1] + relpos[1]), reaction)
+        return len(found)
+
+    # Queues a blast of blast_part with radius around pos. Blasts are written at
+    # the end of the tick by flush_explosions
+    def explode(self, pos:tuple[int,int], radius:int):
+        self.explosions.append((pos, radius))
+
+    # Writes the queued blasts merged into one mask per chunk, so chained and
+    # overlapping blasts cost a single write per chunk they touch. Like every
+    # other write, blasts leave the rows below y = 1 alone
+    def flush_explosions(self):
+        if not self.explosions:
+            return
+        masks = {}
+        for (x, y), radius in self.explosions:
+            origin, disk = self.clip_floor((x - radius, y - radius), disk_mask(radius))
+            for chunk_cords, chunk_area, disk_area in self.sim.chunk_slices(origin, disk.shape):
+                mask = masks.get(chunk_cords)
+                if mask is None:
+                    mask = masks[chunk_cords] = np.zeros(self.chunk_size, dtype=bool)
+                mask[chunk_area] |= disk[disk_area]
+        self.explosions = []
+
+        blast = tables.created[blast_part]
+        for chunk_cords, mask in masks.items():
+            self.sim.fill_chunk(chunk_cords, mask, blast)
+
+    # Spreads and cools the temperature of warm chunks and their neighbours, keeps
+    # cells with hot particles at their heat, then applies the heat_reactions of
+    # particles whose cell got hot enough. Heat flowing into a place without a
+    # chunk is lost.
+    def update_heat(self):
+        width, height = self.chunk_size
+        chunks = set(self.hot_chunks)
+        for chunk_x, chunk_y in self.temperature:
+            chunks.update(((chunk_x, chunk_y), (chunk_x - 1, chunk_y), (chunk_x + 1, chunk_y), (chunk_x, chunk_y - 1), (chunk_x, chunk_y + 1)))
+
+        old = self.temperature
+        self.temperature = {}
+        for chunk_pos in chunks:
+            if chunk_pos in self.unloaded:
+                if chunk_pos in old:
+                    self.temperature[chunk_pos] = old[chunk_pos] # Frozen until loaded again
+                continue
+            chunk = self.sim.get_chunk(chunk_pos)
+            if not chunk:
+                continue
+
+            x, y = chunk_pos
+            padded = np.zeros((width + 2, height + 2), dtype=np.float32)
+            if chunk_pos in old:
+                padded[1:-1, 1:-1] = old[chunk_pos]
+            if (x - 1, y) in old:
+                padded[0, 1:-1] = old[(x - 1, y)][-1]
+            if (x + 1, y) in old:
+                padded[-1, 1:-1] = old[(x + 1, y)][0]
+            if (x, y - 1) in old:
+                padded[1:-1, 0] = old[(x, y - 1)][:, -1]
+            if (x, y + 1) in old:
+                padded[1:-1, -1] = old[(x, y + 1)][:, 0]
+
+            center = padded[1:-1, 1:-1]
+            spread = padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:] - center * 4
+            temperature = (center + spread * self.heat_spread) * self.heat_loss
+            np.maximum(temperature, tables.heat[chunk.ids], out=temperature)
+            if temperature.max() >= self.min_temperature:
+                self.temperature[chunk_pos] = temperature
+
+        simstate = self.sim
+        for chunk_pos, temperature in list(self.temperature.items()):
+            chunk = simstate.get_chunk(chunk_pos)
+            if not chunk or chunk_pos in self.unloaded:
+                continue
+            xs, ys = np.nonzero(temperature >= tables.ignition[chunk.ids])
+            left = chunk_pos[0] * width
+            bottom = chunk_pos[1] * height
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                pos = (left + x, bottom + y)
+                part = simstate.get(pos)
+                if not part or not tables.heat_rows[part[0]]:
+                    continue # Changed by an earlier reaction
+                becomes, radius = tables.heat_rows[part[0]]
+                if self.profiler:
+                    self.profiler.current.reactions[part[0]] += 1
+                if radius != None:
+                    self.explode(pos, radius)
+                if becomes != None:
+                    simstate.set(pos, tables.created[becomes].copy())
+
+    # Wakes the chunks that got dirty since the last tick, with the cells to update
+    def commit_dirty(self):
+        dirty = self.dirty
+        self.dirty = {}
+        for chunk_pos in self.unloaded & dirty.keys():
+            self.dirty[chunk_pos] = dirty.pop(chunk_pos) # Kept until the chunk is loaded again
+
+        for chunk_pos in dirty.keys() & self.watchers.keys():
+            chunk = self.sim.get_chunk(chunk_pos)
+            if not chunk:
+                self.watchers.pop(chunk_pos)
+            else:
+                self.watchers[chunk_pos] = {part_id for part_id in self.trigger_ids if chunk.counts[part_id]}
+
+        if self.heat:
+            for chunk_pos in dirty:
+                chunk = self.sim.get_chunk(chunk_pos)
+                if chunk and chunk.holds(self.heat_ids):
+                    self.hot_chunks.add(chunk_pos)
+                else:
+                    self.hot_chunks.discard(chunk_pos)
+
+        self.active = {chunk_pos: rect for chunk_pos, rect in dirty.items() if self.sim.get_chunk(chunk_pos)}
+
+    def sleep_chunk(self, chunk_pos:tuple[int,int]):
+        self.unloaded.add(chunk_pos)
+        self.active.pop(chunk_pos, None)
+        self.touch_cold(chunk_pos)
+
+    def wake_chunk(self, chunk_pos:tuple[int,int]):
+        self.unloaded.discard(chunk_pos)
+        self.cold.pop(chunk_pos, None)
+        self.sim.get_chunk(chunk_pos) # Pages it in
+        self.mark_local(chunk_pos, (0, 0, self.chunk_size[0] - 1, self.chunk_size[1] - 1))
+
+    # Marks an unloaded chunk as the most recently used
+    def touch_cold(self, chunk_pos:tuple[int,int]):
+        if self.max_cold_chunks == None or chunk_pos not in self.unloaded:
+            return
+        self.cold[chunk_pos] = True
+        self.cold.move_to_end(chunk_pos)
+
+    # Pages out the least recently used unloaded chunks above max_cold_chunks.
+    # Ones next to an active chunk would be read straight back, so they stay
+    def trim_cold(self):
+        if self.max_cold_chunks == None:
+            return
+        kept = []
+        while len(self.cold) > self.max_cold_chunks:
+            chunk_pos, _ = self.cold.popitem(last=False)
+            if chunk_pos not in self.unloaded:
+                continue
+            x, y = chunk_pos
+            if any((x + dx, y + dy) in self.active for dx, dy in neighbor_cords):
+                kept.append(chunk_pos)
+                continue
+            self.sim.page_out(chunk_pos)
+        for chunk_pos in kept:
+            self.cold[chunk_pos] = True
+
+    # Pages every chunk back in and turns paging off, for using the world after
+    # close. Needs the whole world to fit in memory
+    def unpage_all(self):
+        if not self.sim.store:
+            return
+        self.sim.on_page_in = None
+        for chunk_pos in list(self.sim.paged):
+            self.sim.page_in(chunk_pos)
+        self.cold.clear()
+        self.max_cold_chunks = None
+
+    # Stops the worker pool and removes the page file. Chunks that are still
+    # paged out are dropped with it, without reading them back
+    def close(self):
+        if self.mover:
+            self.mover.close()
+        if self.sim.store:
+            self.sim.store.close()
+            self.sim.store = None
+            self.sim.paged = {}
+            self.sim.on_page_in = None
+            self.cold.clear()
+            self.max_cold_chunks = None
+
+    def get_real(self, pos:tuple, chunk_cords:tuple):
+        return (
+            pos[0] + chunk_cords[0] * self.chunk_size[0],
+            pos[1] + chunk_cords[1] * self.chunk_size[1]
+        )
+    
+    def update_chunk(self, chunk_cords:tuple[int,int], simstate:ChunkedGrid):
+        chunk:SparseGrid = simstate.get_chunk(chunk_cords)
+        rect = self.active.get(chunk_cords)
+        if not chunk or not rect:
+            return
+
+        profile = self.profiler.current if self.profiler else None
+        tracer = self.tracer
+        func_sums = {} # update_func name -> [first start, total duration, calls], for the tracer
+        if self.engine == "vector" and tables.vector_moved[chunk.ids[rect[0]:rect[2] + 1, rect[1]:rect[3] + 1]].any():
+            ids, life = simstate.get_window(chunk_cords)
+            if profile:
+                region = ids[rect[0] + 1:rect[2] + 2, rect[1] + 1:rect[3] + 2]
+                profile.add_ids("visited", region[tables.vector_moved[region]])
+                before = ids.copy()
+            moved, waiting = move_window(ids, life, chunk_cords[1] * self.chunk_size[1] - 1, self.random.generator, rect)
+            if moved:
+                if profile:
+                    profile.add_ids("moved", ids[ids != before])
+                    start = perf_counter()
+                simstate.set_window(chunk_cords, ids, life)
+                if profile:
+                    profile.times["writes"] += perf_counter() - start
+            if waiting:
+                self.mark_local(chunk_cords, waiting)
+
+            chunk = simstate.get_chunk(chunk_cords)
+            if not chunk:
+                return
+
+        quickrand = self.random.randint
+        old = list(chunk.get_all(rect, self.visit)) if chunk.holds(self.visit_ids) else []
+        for pos, part_data in old:
+            movements, move_down_chance, movement_chance, update_func = tables.rows[part_data[0]]
+            reactive = not self.dense and self.reactions.reactive_list[part_data[0]]
+            if profile:
+                profile.visited[part_data[0]] += 1
+            
+            old_pos = self.get_real(pos, chunk_cords)
+            new_pos = old_pos
+
+            neighbors = {}
+            for relpos in neighbor_cords:
+                real_pos = (new_pos[0] + relpos[0], new_pos[1] + relpos[1])
+                part_at_pos = simstate.get(real_pos)
+                if part_at_pos:
+                    neighbors[real_pos] = part_at_pos
+
+            if reactive and self.react(old_pos, part_data[0], neighbors):
+                continue # Turned into something else, which moves next tick
+
+            possible_movements = []
+            move_down = None
+            for movement in movements:
+                movement_pos = (new_pos[0] + movement[0], new_pos[1] + movement[1])
+                if movement_pos[1] < 1:
+                    continue
+                part_at_pos = neighbors.get(movement_pos, None)
+                if (not part_at_pos) or (part_at_pos[0] == 4):
+                    deleted = False
+                    if part_at_pos and part_at_pos[0] == 4:
+                        deleted = True
+
+                    movement_data = (movement_pos, deleted)
+                    possible_movements.append(movement_data)
+                    if movement == (0, -1):
+                        move_down = movement_data
+
+            deleted_self = False
+            if update_func:
+                if profile or tracer:
+                    start = perf_counter()
+                part_data, exists, active = update_func(old_pos, part_data, list(neighbors.items()), simstate)
+                if profile or tracer:
+                    took = perf_counter() - start
+                    if profile:
+                        profile.times["update_func"] += took
+                    if tracer:
+                        tracer.add_sum(func_sums, update_func.__name__, (start - tracer.origin) * 1000000, took * 1000000)
+                deleted_self = not exists
+
+                if active: # Keep updating it even if the grid sees no change
+                    self.mark_region(*old_pos, *old_pos)
+            
+            # set new_pos to one of the possible movements
+            # set deleted
+            
+            deleted = False
+            if possible_movements:
+                p_m_count = len(possible_movements)
+                if move_down and (quickrand(100) <= move_down_chance - 1):
+                    new_pos, deleted = move_down
+                else:
+                    if not move_down:
+                        if (quickrand(100) >= movement_chance - 1):
+                            # It could have moved, so it isn't settled yet. Types
+                            # like rock that never win the roll are
+                            if movement_chance > 1:
+                                self.mark_region(*old_pos, *old_pos)
+                            continue
+                    if p_m_count == 1:
+                        new_pos, deleted = possible_movements[0]
+                    else:
+                        new_pos, deleted = possible_movements[quickrand(len(possible_movements))]
+            
+            if deleted_self:
+                deleted = True
+
+            # Movement logic
+            if profile:
+                start = perf_counter()
+            if possible_movements or deleted:
+                simstate.set(old_pos, None)
+
+            if not deleted:
+                simstate.set(new_pos, part_data)
+            if profile:
+                profile.times["writes"] += perf_counter() - start
+                if not deleted and new_pos != old_pos:
+                    profile.moved[part_data[0]] += 1
+
+        if tracer and func_sums:
+            tracer.add_sums(func_sums, "update_func", {"chunk": chunk_cords})
+        if self.dense:
+            if tracer:
+                start = tracer.now()
+            reactions = self.react_chunk(chunk_cords, rect)
+            if tracer and reactions:
+                tracer.add("react_chunk", start, {"chunk": chunk_cords, "reactions": reactions})
@@ -0,0 +1,146 @@
+import json
+import numpy as np
+
+from simulation import Simulation, SparseChunk, DenseChunk
+from particle_tables import tables
+
+# Saves a Simulation to one .npz file and loads it back. All chunks are stored as
+# two stacked (chunk count, width, height) int16 planes of type ids and life, so
+# saving and loading are a few bulk array copies instead of a set per cell. The
+# active chunks, dirty rects, queued triggers, temperatures and random state are
+# stored too, so a loaded world carries on exactly like the saved one would have.
+# Type names are stored next to the ids, and ids are remapped by name if
+# particle_data changed since the snapshot was taken.
+
+snapshot_version = 2 # Version 1 also had the dirty rect history of the old scheduler
+
+def _cords(items) -> np.ndarray:
+    return np.array(list(items), dtype=np.int64).reshape(-1, 2)
+
+def _rects(items) -> np.ndarray:
+    return np.array(list(items), dtype=np.int64).reshape(-1, 4)
+
+# np.savez adds .npz to a path without it, np.load doesn't, so both go through this
+def snapshot_path(path:str) -> str:
+    return path if path.endswith(".npz") else path + ".npz"
+
+def _tuples(array:np.ndarray) -> list:
+    return list(zip(*array.T.tolist()))
+
+def save_snapshot(sim:Simulation, path:str, compress:bool=False):
+    width, height = sim.chunk_size
+    chunks = list(sim.get_chunks())
+    for chunk_pos in sim.sim.paged:
+        chunks.append((chunk_pos, sim.sim.peek_chunk(chunk_pos)))
+    ids = np.full((len(chunks), width, height), -1, dtype=np.int16)
+    life = np.zeros((len(chunks), width, height), dtype=np.int16)
+    order = [] # (chunk index, x, y) of sparse chunk cells, in the order they update in
+    for i, (_, chunk) in enumerate(chunks):
+        if hasattr(chunk, "ids"):
+            ids[i] = chunk.ids
+            life[i] = chunk.life
+            continue
+        cells = list(chunk.get_all())
+        if cells:
+            xs, ys = zip(*(pos for pos, _ in cells))
+            ids[i, xs, ys] = [part[0] for _, part in cells]
+            life[i, xs, ys] = [part[1] for _, part in cells]
+            order.extend((i, x, y) for x, y in zip(xs, ys))
+
+    temperature = np.zeros((len(sim.temperature), width, height), dtype=np.float32)
+    for i, chunk_temperature in enumerate(sim.temperature.values()):
+        temperature[i] = chunk_temperature
+
+    save = np.savez_compressed if compress else np.savez
+    save(
+        snapshot_path(path),
+        version=snapshot_version,
+        chunk_size=np.array(sim.chunk_size),
+        dense=sim.dense, heat=sim.heat, event_triggers=sim.event_triggers,
+        lazy=sim.lazy, lazy_range=sim.lazy_range, ticks=sim.ticks,
+        names=np.array(tables.names),
+        chunk_cords=_cords(chunk_pos for chunk_pos, _ in chunks), ids=ids, life=life,
+        order=np.array(order, dtype=np.int64).reshape(-1, 3),
+        active_cords=_cords(sim.active.keys()), rects=_rects(sim.active.values()),
+        dirty_cords=_cords(sim.dirty.keys()), dirty=_rects(sim.dirty.values()),
+        unloaded=_cords(sim.unloaded),
+        triggered=_cords(sim.triggered), # In iteration order, so the set comes back the same
+        temperature_cords=_cords(sim.temperature.keys()), temperature=temperature,
+        random_state=json.dumps(sim.random.generator.bit_generator.state),
+        random_block=np.array(sim.random.block), random_index=sim.random.index,
+    )
+
+# Type ids of a snapshot taken with the types in names, as ids of the current tables
+def _remap(ids:np.ndarray, names:list):
+    if names == tables.names:
+        return ids
+    lookup = np.full(len(names) + 1, -1, dtype=np.int16)
+    for old_id, name in enumerate(names):
+        if name not in tables.names:
+            raise ValueError(f"The snapshot has particles of type {name!r}, which no longer exists")
+        lookup[old_id] = tables.names.index(name)
+    return lookup[ids]
+
+# The grid settings come from the snapshot, the engine and paging can be picked freely
+def load_snapshot(path:str, engine:str="particle", workers:int=None, max_cold_chunks:int=None, page_file:str=None):
+    path = snapshot_path(path)
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data["version"])
+        if version not in (1, snapshot_version):
+            raise ValueError(f"{path} is a version {version} snapshot, expected version {snapshot_version}")
+
+        chunk_size = tuple(data["chunk_size"].tolist())
+        dense = bool(data["dense"])
+        sim = Simulation(
+            chunk_size, lazy=bool(data["lazy"]), lazy_range=int(data["lazy_range"]), dense=dense,
+            engine=engine, workers=workers, event_triggers=bool(data["event_triggers"]), heat=bool(data["heat"]),
+            max_cold_chunks=max_cold_chunks, page_file=page_file
+        )
+        sim.ticks = int(data["ticks"])
+
+        ids = _remap(data["ids"], data["names"].tolist())
+        life = data["life"]
+        chunk_cords = _tuples(data["chunk_cords"])
+        # The per type counts of every chunk in one bincount over all planes, with
+        # the ids of chunk i shifted to their own range of bins. Empty cells
+        # (-1) land in the unused last bin of each chunk
+        bins = tables.count + 1
+        counts = np.bincount((ids.astype(np.int64) % bins + np.arange(len(ids))[:, None, None] * bins).ravel(), minlength=len(ids) * bins).reshape(-1, bins)
+        counts[:, -1] = 0
+        chunk_counts = counts.tolist()
+        if dense:
+            for i, chunk_pos in enumerate(chunk_cords):
+                chunk = DenseChunk.from_arrays(ids[i], life[i], chunk_counts[i])
+                sim.sim.data.set(chunk_pos, chunk)
+        else:
+            chunks = [SparseChunk() for _ in chunk_cords]
+            order = data["order"]
+            indices, xs, ys = order.T
+            for i, x, y, part_id, part_life in zip(indices.tolist(), xs.tolist(), ys.tolist(), ids[indices, xs, ys].tolist(), life[indices, xs, ys].tolist()):
+                chunks[i].data[(x, y)] = [part_id, part_life]
+            for chunk_pos, chunk, chunk_count in zip(chunk_cords, chunks, chunk_counts):
+                chunk.counts = chunk_count
+                sim.sim.data.set(chunk_pos, chunk)
+        sim.sim.counts = counts.sum(axis=0).tolist()
+
+        sim.active = dict(zip(_tuples(data["active_cords"]), _tuples(data["rects"])))
+        sim.dirty = dict(zip(_tuples(data["dirty_cords"]), _tuples(data["dirty"])))
+        sim.unloaded = set(_tuples(data["unloaded"]))
+        for chunk_pos in sim.unloaded:
+            sim.touch_cold(chunk_pos)
+        sim.triggered = set(_tuples(data["triggered"]))
+        sim.temperature = dict(zip(_tuples(data["temperature_cords"]), data["temperature"]))
+
+        # Watchers and hot chunks follow from the chunk counts
+        for part_id in sim.trigger_ids:
+            for i in np.nonzero(counts[:, part_id])[0].tolist():
+                sim.watchers.setdefault(chunk_cords[i], set()).add(part_id)
+        if sim.heat:
+            for i in np.nonzero(counts[:, sim.heat_ids].any(axis=1))[0].tolist():
+                sim.hot_chunks.add(chunk_cords[i])
+
+        sim.random.generator.bit_generator.state = json.loads(str(data["random_state"]))
+        sim.random.block = data["random_block"].tolist()
+        sim.random.block_size = len(sim.random.block)
+        sim.random.index = int(data["random_index"])
+    return sim
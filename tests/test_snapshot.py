@@ -0,0 +1,30 @@
+import os
+import tempfile
+import unittest
+
+from simulation import Simulation
+from snapshot import save_snapshot, load_snapshot
+from scenes import scenes
+
+class SnapshotPathTest(unittest.TestCase):
+    def round_trip(self, name:str):
+        sim = Simulation((16, 16), lazy=False, seed=1)
+        scenes["sand"](sim, 32)
+        for _ in range(5):
+            sim.update()
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, name)
+            save_snapshot(sim, path)
+            loaded = load_snapshot(path)
+        self.assertEqual(loaded.sim.counts, sim.sim.counts)
+        self.assertEqual(loaded.ticks, sim.ticks)
+
+    def test_with_suffix(self):
+        self.round_trip("world.npz")
+
+    # np.savez writes world.npz for it, loading has to find that file too
+    def test_without_suffix(self):
+        self.round_trip("world")
+
+if __name__ == "__main__":
+    unittest.main()
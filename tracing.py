@@ -0,0 +1,91 @@
+import json
+import os
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter
+
+# Records a timeline of the engine as Chrome trace events, collected while
+# sim.tracer is set:
+#   sim.tracer = Tracer()
+#   ...
+#   sim.tracer.save("trace.json")
+# The file opens in chrome://tracing or https://ui.perfetto.dev. Every event is a
+# complete ("X") event, a begin time and a duration in microseconds, and events
+# inside another one show up nested under it. Only the newest max_events are
+# kept, so a long session can be traced without running out of memory.
+
+class Tracer:
+    def __init__(self, max_events:int=1000000):
+        self.events = deque(maxlen=max_events)
+        self.origin = perf_counter()
+        self.pid = os.getpid()
+        self.lap_start = 0
+        self.tick_start = 0
+        self.tick = 0
+
+    # Microseconds since the tracer was made
+    def now(self):
+        return (perf_counter() - self.origin) * 1000000
+
+    def add(self, name:str, start:float, args:dict=None, category:str="engine", duration:float=None):
+        if duration == None:
+            duration = self.now() - start
+        event = {"name": name, "cat": category, "ph": "X", "ts": start, "dur": duration, "pid": self.pid, "tid": 0}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    # with tracer.span("name", **args): records the block as one event
+    def span(self, name:str, category:str="engine", **args):
+        return Span(self, name, category, args)
+
+    def start_tick(self, tick:int):
+        self.tick = tick
+        self.tick_start = self.lap_start = self.now()
+
+    def end_tick(self, **args):
+        self.add("tick", self.tick_start, {"tick": self.tick, **args})
+
+    # Records the time since the last lap (or the start of the tick) as stage
+    def lap(self, stage:str, args:dict=None):
+        now = self.now()
+        self.add(stage, self.lap_start, args, duration=now - self.lap_start)
+        self.lap_start = now
+
+    # Adds one call of a timed function to sums, {name: [first start, total duration, calls]}.
+    # Many short calls are recorded as one event per name by add_sums
+    def add_sum(self, sums:dict, name:str, start:float, duration:float):
+        summed = sums.get(name)
+        if summed:
+            summed[1] += duration
+            summed[2] += 1
+        else:
+            sums[name] = [start, duration, 1]
+
+    def add_sums(self, sums:dict, category:str, args:dict=None):
+        for name, (start, duration, calls) in sums.items():
+            self.add(name, start, {"calls": calls, **(args or {})}, category, duration)
+
+    def save(self, path:str):
+        metadata = {"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": "ParticleEngine"}}
+        with open(path, "w") as f:
+            json.dump({"traceEvents": [metadata, *self.events], "displayTimeUnit": "ms"}, f)
+
+class Span:
+    def __init__(self, tracer:Tracer, name:str, category:str, args:dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.start, self.args, self.category)
+        return False
+
+# Stands in for Tracer.span when there is no tracer
+def no_span(*args, **kwargs):
+    return nullcontext()